@@ -0,0 +1,107 @@
+"""Cold-start time of a multi-worker uvicorn deployment.
+
+Starts `uvicorn main:app --workers N` (run from backend/, with DATABASE_URL
+set), notes when each worker logs "Application startup complete", then polls
+/api/health/ready until the database answers. Also times a bare `import main`
+in a fresh interpreter, which every worker pays first.
+
+    python benchmarks/cold_start.py --workers 4 --runs 3 --json results/cold-start.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READY_LINE = re.compile(r"Application startup complete")
+
+
+def import_seconds():
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def wait_ready(url: str, timeout: float):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.02)
+    return False
+
+
+def one_run(args):
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--port", str(args.port), "--workers", str(args.workers), "--log-level", "info",
+    ]
+    launched = time.perf_counter()
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, stderr=subprocess.PIPE, text=True)
+    workers_ready = []
+
+    def read_log():
+        for line in process.stderr:
+            if READY_LINE.search(line):
+                workers_ready.append(time.perf_counter() - launched)
+
+    reader = threading.Thread(target=read_log, daemon=True)
+    reader.start()
+    try:
+        ready = wait_ready(f"http://127.0.0.1:{args.port}/api/health/ready", args.timeout)
+        first_ready = time.perf_counter() - launched
+        # Let the remaining workers report in
+        deadline = time.perf_counter() + args.timeout
+        while len(workers_ready) < args.workers and time.perf_counter() < deadline:
+            time.sleep(0.05)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+    return {
+        "ready": ready,
+        "first_ready_s": round(first_ready, 3),
+        "workers_ready_s": [round(t, 3) for t in sorted(workers_ready)],
+        "all_workers_ready_s": round(max(workers_ready), 3) if workers_ready else None,
+    }
+
+
+def main(args):
+    imports = [import_seconds() for _ in range(args.runs)]
+    print(f"import main: median {statistics.median(imports) * 1000:.0f}ms over {args.runs} runs")
+
+    runs = []
+    for _ in range(args.runs):
+        result = one_run(args)
+        runs.append(result)
+        print(
+            f"{args.workers} workers: first ready {result['first_ready_s']}s, "
+            f"all workers {result['all_workers_ready_s']}s, per worker {result['workers_ready_s']}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"workers": args.workers, "import_s": imports, "runs": runs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8123)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", help="Also write the results to this file")
+    main(parser.parse_args())
@@ -0,0 +1,49 @@
+"""Diff two result files from load.py or micro.py.
+
+    python benchmarks/compare.py results/before.json results/after.json --threshold 10
+
+Prints the change of every shared case and exits with status 1 when a p95
+got slower, or throughput dropped, by more than --threshold percent.
+"""
+import argparse
+import json
+import sys
+
+THROUGHPUT_FIELDS = ("rps", "ops_per_sec")
+
+
+def percent_change(before: float, after: float):
+    if not before:
+        return 0.0
+    return (after - before) / before * 100
+
+
+def compare(before: dict, after: dict, threshold: float):
+    regressions = []
+    for name in [name for name in before["results"] if name in after["results"]]:
+        old, new = before["results"][name], after["results"][name]
+        throughput = next(field for field in THROUGHPUT_FIELDS if field in old)
+        p95_change = percent_change(old["p95_ms"], new["p95_ms"])
+        throughput_change = percent_change(old[throughput], new[throughput])
+        slower = p95_change > threshold or throughput_change < -threshold
+        if slower:
+            regressions.append(name)
+        print(
+            f"{name:<18} p95 {old['p95_ms']:>10} -> {new['p95_ms']:<10} ({p95_change:+.1f}%)  "
+            f"{throughput} {old[throughput]:>10} -> {new[throughput]:<10} ({throughput_change:+.1f}%)"
+            f"{'  REGRESSION' if slower else ''}"
+        )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed slowdown in percent")
+    args = parser.parse_args()
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    sys.exit(1 if compare(before, after, args.threshold) else 0)
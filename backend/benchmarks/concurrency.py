@@ -0,0 +1,88 @@
+"""Requests/sec of one endpoint at increasing client concurrency.
+
+Run the API first (e.g. `uvicorn main:app --port 8000`), make sure the account
+below exists and is active, then:
+
+    python benchmarks/concurrency.py --email bench@example.com --password secret
+
+Needs httpx (`pip install httpx`), which is not an app dependency.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str):
+    response = await client.post("/api/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def worker(client, path, headers, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.get(path, headers=headers)
+            if response.status_code >= 400 and response.status_code != 404:
+                errors.append(response.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_level(base_url, path, token, clients, duration):
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies, errors = [], []
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(
+            worker(client, path, headers, deadline, latencies, errors) for _ in range(clients)
+        ))
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": round(len(latencies) / duration, 1),
+        "p50_ms": round(quantiles[49] * 1000, 1),
+        "p95_ms": round(quantiles[94] * 1000, 1),
+        "p99_ms": round(quantiles[98] * 1000, 1),
+    }
+
+
+async def main(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+        token = await login(client, args.email, args.password)
+
+    results = []
+    for clients in args.clients:
+        result = await run_level(args.base_url, args.path, token, clients, args.duration)
+        results.append(result)
+        print(
+            f"{clients:>4} clients  {result['rps']:>8} req/s  "
+            f"p50 {result['p50_ms']}ms  p95 {result['p95_ms']}ms  p99 {result['p99_ms']}ms  "
+            f"errors {result['errors']}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"path": args.path, "duration": args.duration, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--path", default="/api/assessments/expert/latest")
+    parser.add_argument("--clients", type=lambda s: [int(c) for c in s.split(",")], default=[50, 200, 500])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--json", help="Also write the results to this file")
+    asyncio.run(main(parser.parse_args()))
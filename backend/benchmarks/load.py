@@ -0,0 +1,199 @@
+"""Latency and throughput of the main API paths against a running server.
+
+Seed a scratch database with benchmarks/seed.py, start the API on it, then:
+
+    uvicorn main:app --port 8000
+    python benchmarks/load.py --label sqlite-100k --json results/sqlite-100k.json
+
+Each scenario runs for --duration seconds with --clients concurrent clients.
+Results go to stdout and, with --json, to a file that benchmarks/compare.py
+can diff against an earlier run. Needs httpx, which is not an app dependency.
+
+The login scenario runs into the auth rate limits; start the server with e.g.
+RATE_LIMIT_LOGIN_IP=1000000/1 RATE_LIMIT_LOGIN_ACCOUNT=1000000/1 to measure it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from concurrency import login
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import scoring_engine  # noqa: E402
+from seed import ADMIN_EMAIL, account_is_active, user_email  # noqa: E402
+
+
+def summarize(latencies: list, errors: int, duration: float):
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / duration, 1),
+        "p50_ms": round(quantiles[49] * 1000, 2),
+        "p95_ms": round(quantiles[94] * 1000, 2),
+        "p99_ms": round(quantiles[98] * 1000, 2),
+    }
+
+
+class Context:
+    """Tokens and ids the scenarios draw from, fetched once before the run."""
+
+    def __init__(self, args, admin_token, user_tokens, user_ids, thread_ids):
+        self.args = args
+        self.admin = {"Authorization": f"Bearer {admin_token}"}
+        self.users = [{"Authorization": f"Bearer {token}"} for token in user_tokens]
+        self.user_ids = user_ids
+        self.thread_ids = thread_ids
+
+    def user(self):
+        return random.choice(self.users)
+
+    def active_account(self):
+        # Seeded accounts that can actually log in
+        while True:
+            n = random.randrange(self.args.accounts)
+            if account_is_active(n):
+                return n
+
+
+# Each scenario issues one request and returns the response
+async def login_scenario(client, ctx):
+    email = user_email(ctx.active_account())
+    return await client.post("/api/login", data={"username": email, "password": ctx.args.password})
+
+
+async def me_scenario(client, ctx):
+    return await client.get("/api/me", headers=ctx.user())
+
+
+async def expert_submit_scenario(client, ctx):
+    scores = {tid: random.randint(1, 8) for tid in ctx.thread_ids}
+    return await client.post("/api/assessments/expert", json=scores, headers=ctx.user())
+
+
+async def expert_latest_scenario(client, ctx):
+    return await client.get("/api/assessments/expert/latest", headers=ctx.user())
+
+
+async def admin_users_scenario(client, ctx):
+    return await client.get("/api/admin/users", params={"limit": 50, "sort": "last_name"}, headers=ctx.admin)
+
+
+async def history_scenario(client, ctx):
+    user_id = random.choice(ctx.user_ids)
+    return await client.get(f"/api/admin/users/{user_id}/assessments", headers=ctx.admin)
+
+
+SCENARIOS = {
+    "login": login_scenario,
+    "me": me_scenario,
+    "expert_submit": expert_submit_scenario,
+    "expert_latest": expert_latest_scenario,
+    "admin_users": admin_users_scenario,
+    "history": history_scenario,
+}
+
+
+async def worker(client, scenario, ctx, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await scenario(client, ctx)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_scenario(ctx, name):
+    args = ctx.args
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    latencies, errors = [], []
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(*(
+            worker(client, SCENARIOS[name], ctx, deadline, latencies, errors) for _ in range(args.clients)
+        ))
+    return summarize(latencies, len(errors), args.duration)
+
+
+async def prepare(args):
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+        admin_token = await login(client, ADMIN_EMAIL, args.password)
+        # Log in a handful of accounts up front so the token-based scenarios skip bcrypt
+        emails = [user_email(n) for n in range(min(args.accounts, args.tokens)) if account_is_active(n)]
+        # (one at a time: a burst would just trip the hash queue's 503 backpressure)
+        user_tokens = [await login(client, email, args.password) for email in emails]
+
+        page = await client.get(
+            "/api/admin/users", params={"limit": 100, "role": "user", "is_active": "true"},
+            headers={"Authorization": f"Bearer {admin_token}"},
+        )
+        page.raise_for_status()
+        user_ids = [user["id"] for user in page.json()["items"]]
+
+    return Context(args, admin_token, user_tokens, user_ids, scoring_engine.thread_ids)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args):
+    ctx = await prepare(args)
+    results = {}
+    for name in args.scenarios:
+        result = await run_scenario(ctx, name)
+        results[name] = result
+        print(
+            f"{name:<14} {result['rps']:>8} req/s  p50 {result['p50_ms']}ms  "
+            f"p95 {result['p95_ms']}ms  p99 {result['p99_ms']}ms  errors {result['errors']}"
+        )
+
+    if args.json:
+        report = {
+            "label": args.label,
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "base_url": args.base_url,
+            "clients": args.clients,
+            "duration": args.duration,
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--password", default="bench-password", help="Password given to seed.py")
+    parser.add_argument("--accounts", type=int, default=100, help="How many seeded bench-user accounts to draw from")
+    parser.add_argument("--tokens", type=int, default=20, help="Accounts logged in up front for token scenarios")
+    parser.add_argument(
+        "--scenarios", type=lambda s: s.split(","), default=list(SCENARIOS),
+        help=f"Comma separated, any of: {', '.join(SCENARIOS)}",
+    )
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--label", default="", help="Free text stored in the JSON, e.g. the data size")
+    parser.add_argument("--json", help="Also write the results to this file")
+    asyncio.run(main(parser.parse_args()))
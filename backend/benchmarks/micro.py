@@ -0,0 +1,134 @@
+"""In-process micro-benchmarks of the hot paths that do not need a server.
+
+    python benchmarks/micro.py --json results/micro.json
+
+Each case is timed call by call (coroutine cases awaited inside one event
+loop, so the loop's own start-up is not in the timings), so the output has the same p50/p95/p99 and
+throughput fields as load.py and both can be diffed with compare.py.
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import passwords  # noqa: E402
+from jose import jwt  # noqa: E402
+from main import (  # noqa: E402
+    ALGORITHM, BCRYPT_ROUNDS, SECRET_KEY, CachedUser, LocalTTLCache, UserCache, create_access_token,
+    scoring_engine,
+)
+from load import git_revision  # noqa: E402
+
+
+def random_scores():
+    return {tid: random.randint(1, 8) for tid in scoring_engine.thread_ids}
+
+
+def summarize(timings: list, iterations: int):
+    quantiles = statistics.quantiles(timings, n=100)
+    return {
+        "iterations": iterations,
+        "ops_per_sec": round(iterations / sum(timings), 1),
+        "p50_ms": round(quantiles[49] * 1000, 4),
+        "p95_ms": round(quantiles[94] * 1000, 4),
+        "p99_ms": round(quantiles[98] * 1000, 4),
+    }
+
+
+def measure(fn, iterations: int, warmup: int = 10):
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return summarize(timings, iterations)
+
+
+async def measure_async(fn, iterations: int, warmup: int = 10):
+    for _ in range(warmup):
+        await fn()
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await fn()
+        timings.append(time.perf_counter() - started)
+    return summarize(timings, iterations)
+
+
+def cases(iterations: int):
+    scores = random_scores()
+    batch = [random_scores() for _ in range(1000)]
+    token = create_access_token({"sub": "bench-user-1@example.com"})
+    hashed = passwords.get_password_hash("bench-password", BCRYPT_ROUNDS)
+    # Same backend and keys (user ids) as the app's profile cache, filled up front
+    user_cache = UserCache(LocalTTLCache(max_entries=10000, ttl_seconds=300))
+
+    async def fill():
+        for n in range(1, 10001):
+            await user_cache.set(CachedUser(
+                id=n, email=f"bench-user-{n}@example.com", first_name="First", last_name="Last",
+                role="user", is_active=True,
+            ))
+
+    asyncio.run(fill())
+
+    async def user_cache_get():
+        return await user_cache.get(random.randint(1, 10000))
+
+    # name -> (callable, iterations); bcrypt is slow by design so it gets fewer rounds
+    return {
+        "score_single": (lambda: scoring_engine.score(scores), iterations),
+        "score_batch_1000": (lambda: scoring_engine.score_batch(batch), max(10, iterations // 100)),
+        "jwt_encode": (lambda: create_access_token({"sub": "bench-user-1@example.com"}), iterations),
+        "jwt_decode": (lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]), iterations),
+        "user_cache_get": (user_cache_get, iterations),
+        "bcrypt_verify": (lambda: passwords.verify_password("bench-password", hashed), 20),
+    }
+
+
+def main(args):
+    random.seed(args.seed)
+    results = {}
+    for name, (fn, iterations) in cases(args.iterations).items():
+        if args.cases and name not in args.cases:
+            continue
+        if inspect.iscoroutinefunction(fn):
+            result = asyncio.run(measure_async(fn, iterations))
+        else:
+            result = measure(fn, iterations)
+        results[name] = result
+        print(
+            f"{name:<18} {result['ops_per_sec']:>12} ops/s  p50 {result['p50_ms']}ms  "
+            f"p95 {result['p95_ms']}ms  p99 {result['p99_ms']}ms"
+        )
+
+    if args.json:
+        report = {
+            "label": args.label,
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--cases", type=lambda s: s.split(","), help="Comma separated subset to run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="")
+    parser.add_argument("--json", help="Also write the results to this file")
+    main(parser.parse_args())
@@ -0,0 +1,124 @@
+"""Fill a database with synthetic users and assessments for the load tests.
+
+Uses the same DATABASE_URL as the app, so point it at a scratch database:
+
+    DATABASE_URL=sqlite:///./bench.db python benchmarks/seed.py --assessments 100000 --create-schema
+
+Every seeded account (bench-user-<n>@example.com and the admin
+bench-admin@example.com) has the password given by --password. The
+assessment count is split evenly between detailed and expert rows, spread
+over --per-user assessments per account. Data is generated from a fixed
+seed, so two runs at the same size produce the same scores and spread.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import passwords  # noqa: E402
+from main import (  # noqa: E402
+    BCRYPT_ROUNDS, Base, DBDetailedAssessment, DBExpertAssessment, DBUser, SessionLocal,
+    close_database, init_database, refresh_latest_pointers, scoring_engine,
+)
+from sqlalchemy import insert, select  # noqa: E402
+
+ADMIN_EMAIL = "bench-admin@example.com"
+CHUNK = 10000
+
+
+def user_email(n: int):
+    return f"bench-user-{n}@example.com"
+
+
+def account_is_active(n: int):
+    # Every tenth account is disabled so the is_active filters have something to do
+    return n % 10 != 9
+
+
+def user_rows(count: int, hashed_password: str):
+    yield {
+        "email": ADMIN_EMAIL, "first_name": "Bench", "last_name": "Admin",
+        "hashed_password": hashed_password, "role": "admin", "is_active": True,
+    }
+    for n in range(count):
+        yield {
+            "email": user_email(n), "first_name": f"First{n % 997}", "last_name": f"Last{n}",
+            "hashed_password": hashed_password, "role": "user", "is_active": account_is_active(n),
+        }
+
+
+def assessment_rows(kind: str, user_ids: list, per_user: int, rng: np.random.Generator):
+    # Scores are whole numbers 1-8, timestamps spread over the last year
+    competences = scoring_engine.competences
+    now = datetime.now(timezone.utc)
+    owners = np.repeat(user_ids, per_user)
+    for start in range(0, len(owners), CHUNK):
+        batch = owners[start:start + CHUNK]
+        ages = rng.integers(0, 365 * 24 * 60, size=len(batch))
+        if kind == "expert":
+            threads = rng.integers(1, 9, size=(len(batch), len(scoring_engine.thread_ids))).astype(float)
+            competence_scores, _ = scoring_engine.score_matrix(threads)
+        else:
+            competence_scores = rng.integers(1, 9, size=(len(batch), len(competences)))
+        rows = []
+        for i, user_id in enumerate(batch):
+            row = {"user_id": int(user_id), "created_at": now - timedelta(minutes=int(ages[i]))}
+            if kind == "expert":
+                row["thread_scores"] = dict(zip(scoring_engine.thread_ids, threads[i].astype(int).tolist()))
+                row.update(scoring_engine.results(competence_scores[i]))
+            else:
+                row.update(zip(competences, competence_scores[i].tolist()))
+            rows.append(row)
+        yield rows
+
+
+async def seed(args):
+    rng = np.random.default_rng(args.seed)
+    users = max(1, args.assessments // (2 * args.per_user))
+    hashed = passwords.get_password_hash(args.password, BCRYPT_ROUNDS)
+
+    engine = init_database()
+    if args.create_schema:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    started = time.perf_counter()
+    async with SessionLocal() as db:
+        rows = list(user_rows(users, hashed))
+        for i in range(0, len(rows), CHUNK):
+            await db.execute(insert(DBUser), rows[i:i + CHUNK])
+        await db.commit()
+        # The admin is inserted first, the regular users follow in order
+        first_id = await db.scalar(select(DBUser.id).where(DBUser.email == user_email(0)))
+        user_ids = list(range(first_id, first_id + users))
+
+        for kind, model, field in (
+            ("detailed", DBDetailedAssessment, "latest_detailed_id"),
+            ("expert", DBExpertAssessment, "latest_expert_id"),
+        ):
+            for rows in assessment_rows(kind, user_ids, args.per_user, rng):
+                await db.execute(insert(model), rows)
+            await refresh_latest_pointers(db, model, field, user_ids)
+            await db.commit()
+    await close_database()
+
+    print(
+        f"seeded {users} users and {users * args.per_user * 2} assessments "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--assessments", type=int, default=1000, help="Total rows, e.g. 1000, 100000, 1000000")
+    parser.add_argument("--per-user", type=int, default=5, help="Detailed and expert assessments per account")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--create-schema", action="store_true", help="Run create_all first (scratch databases)")
+    asyncio.run(seed(parser.parse_args()))
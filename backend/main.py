@@ -1,17 +1,49 @@
 import os
-import bcrypt  # We use this directly now
-from fastapi import FastAPI, Depends, HTTPException
+import io
+import math
+import csv
+import json
+import base64
+import glob
+import hashlib
+import asyncio
+import time
+import queue
+import logging
+import threading
+import urllib.request
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+from types import MappingProxyType
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, Query
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, DateTime, Boolean, func, JSON
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from sqlalchemy import event, Table, Column, Integer, String, Float, ForeignKey, DateTime, Boolean, Index, func, JSON, LargeBinary, TypeDecorator, select, delete, insert, update, exists, or_, and_, case, cast, literal, literal_column, text, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.orm import relationship
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.sql import func
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, ValidationError
 from dotenv import load_dotenv
 from jose import JWTError, jwt
-from datetime import datetime, timedelta
-from typing import List
+from datetime import datetime, timedelta, timezone
+from typing import List, Literal, Optional, Union
+import numpy as np
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily
+import passwords
+
+# Optional, only needed for Parquet exports; imported on first use (see load_pyarrow)
+pa = pq = None
 
 load_dotenv()
 
@@ -19,34 +51,334 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "a-very-secret-random-string")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Password hashing (bcrypt is CPU heavy, so it runs in its own process pool)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 2)))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", str(HASH_WORKERS * 4)))
+HASH_RETRY_AFTER_SECONDS = int(os.getenv("HASH_RETRY_AFTER_SECONDS", "2"))
+
+# Authenticated-user cache (set CACHE_URL=redis://... to share it between workers)
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+CACHE_URL = os.getenv("CACHE_URL")
+# Without CACHE_URL every worker keeps its own token versions, so a revocation
+# (deactivation, password change, deletion) reaches the other workers only when
+# their entry expires: keep this short, or set CACHE_URL when running several workers
+TOKEN_VERSION_LOCAL_TTL_SECONDS = int(os.getenv("TOKEN_VERSION_LOCAL_TTL_SECONDS", "5"))
+
+# Token buckets for the auth routes, "<attempts>/<seconds>". RATE_LIMIT_URL
+# (redis://...) shares the buckets between workers, otherwise they are per process.
+def parse_rate(value: str):
+    attempts, seconds = value.split("/")
+    return int(attempts), float(seconds)
+
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMITS_PER_IP = {
+    "/api/login": parse_rate(os.getenv("RATE_LIMIT_LOGIN_IP", "30/60")),
+    "/api/register": parse_rate(os.getenv("RATE_LIMIT_REGISTER_IP", "10/600")),
+    "/api/change-password": parse_rate(os.getenv("RATE_LIMIT_CHANGE_PASSWORD_IP", "10/60")),
+}
+RATE_LIMITS_PER_ACCOUNT = {
+    "/api/login": parse_rate(os.getenv("RATE_LIMIT_LOGIN_ACCOUNT", "10/300")),
+    "/api/change-password": parse_rate(os.getenv("RATE_LIMIT_CHANGE_PASSWORD_ACCOUNT", "5/300")),
+}
+
+# Schema is managed by Alembic (`alembic upgrade head`); this is only a shortcut
+# for throwaway local SQLite databases
+AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA", "false").lower() in ("1", "true", "yes")
+
+# Bulk ingestion (LMS / classroom imports)
+BULK_MAX_RECORDS = int(os.getenv("BULK_MAX_RECORDS", "20000"))
+# Upload size cap, checked while the body arrives (20000 expert records as JSON are ~30 MB)
+BULK_MAX_BYTES = int(os.getenv("BULK_MAX_BYTES", str(64 * 1024 * 1024)))
+BULK_INSERT_CHUNK = int(os.getenv("BULK_INSERT_CHUNK", "1000"))
+# Explicit user ids accepted by one admin batch action or group membership change
+ADMIN_BATCH_MAX_IDS = int(os.getenv("ADMIN_BATCH_MAX_IDS", "5000"))
+
+# Retention: assessments older than RETENTION_DAYS are rolled into monthly
+# per-user aggregates and moved to the *_archive tables (see the RETENTION section)
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "730"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+
+# Assessment framework definitions (see the ASSESSMENT FRAMEWORK section);
+# FRAMEWORK_VERSION pins the one used for scoring, the newest otherwise
+FRAMEWORK_DIR = os.getenv("FRAMEWORK_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "framework"))
+FRAMEWORK_VERSION = int(os.getenv("FRAMEWORK_VERSION", "0")) or None
+
+# Rows fetched per round trip by the streaming exports
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+
+# Idempotency-Key replays for the submit routes (shared between workers with CACHE_URL)
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "100000"))
+# How long a claimed key blocks copies of its request before the response is stored;
+# should outlast the slowest submit, since a retry after it runs the request again
+IDEMPOTENCY_PENDING_SECONDS = int(os.getenv("IDEMPOTENCY_PENDING_SECONDS", "60"))
+
+# Cohort analytics results are cached until the TTL runs out or a new assessment arrives.
+# Without CACHE_URL the invalidation only reaches the worker that took the write,
+# so the others keep their copy for ANALYTICS_LOCAL_CACHE_TTL_SECONDS at most
+ANALYTICS_CACHE_TTL_SECONDS = int(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "600"))
+ANALYTICS_LOCAL_CACHE_TTL_SECONDS = int(os.getenv("ANALYTICS_LOCAL_CACHE_TTL_SECONDS", "60"))
+# Background jobs: JOB_QUEUE_URL (redis://...) shares the queue between workers
+JOB_QUEUE_URL = os.getenv("JOB_QUEUE_URL")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "1000"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_SECONDS = float(os.getenv("JOB_RETRY_SECONDS", "1"))
+JOB_DRAIN_SECONDS = float(os.getenv("JOB_DRAIN_SECONDS", "5"))
+# How long a keyed job may wait in the queue (on top of its delay) before its key
+# is freed anyway, in case the worker holding it died
+JOB_KEY_TTL_SECONDS = int(os.getenv("JOB_KEY_TTL_SECONDS", "600"))
+# Submits within this window share one analytics recompute
+ANALYTICS_WARM_DELAY_SECONDS = float(os.getenv("ANALYTICS_WARM_DELAY_SECONDS", "30"))
+NOTIFY_WEBHOOK_URL = os.getenv("NOTIFY_WEBHOOK_URL")  # POSTed {"event": "assessment.created", ...}
+# Per-assessment averages kept on each progress row for the trend chart
+PROGRESS_TREND_POINTS = int(os.getenv("PROGRESS_TREND_POINTS", "20"))
+
+# --- LOGGING ---
+# JSON lines on stderr. Records go through a queue and a background thread does the
+# actual write, so a slow stdout never blocks a request.
+_LOG_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        # Anything passed via extra={...}
+        data.update({k: v for k, v in vars(record).items() if k not in _LOG_RECORD_FIELDS})
+        return json.dumps(data, default=str)
+
+logger = logging.getLogger("entrecomp")
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+_log_queue = queue.SimpleQueue()
+_log_output = logging.StreamHandler()
+_log_output.setFormatter(JsonFormatter())
+logger.addHandler(QueueHandler(_log_queue))
+log_listener = QueueListener(_log_queue, _log_output)
+
+
+# --- METRICS ---
+# Prometheus metrics served on /metrics. Per-request DB numbers are collected in a
+# context variable that the middleware sets and the SQLAlchemy event hooks fill in.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "Request latency", ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+http_request_db_queries = Histogram(
+    "http_request_db_queries", "DB queries per request", ["route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+http_request_db_seconds = Histogram(
+    "http_request_db_seconds", "Time spent in DB queries per request", ["route"], buckets=LATENCY_BUCKETS,
+)
+db_pool_checkout_seconds = Histogram(
+    "db_pool_checkout_seconds", "Wait for a pooled DB connection", buckets=LATENCY_BUCKETS,
+)
+password_hash_seconds = Histogram(
+    "password_hash_seconds", "bcrypt job time including pool queueing", ["operation"], buckets=LATENCY_BUCKETS,
+)
+jobs_total = Counter("jobs", "Background jobs by outcome", ["name", "outcome"])
+job_seconds = Histogram("job_duration_seconds", "Background job run time", ["name"], buckets=LATENCY_BUCKETS)
+job_queue_depth = Gauge("job_queue_depth", "Jobs waiting in the queue")
+rate_limited_total = Counter("rate_limited", "Requests refused with 429", ["route", "scope"])
+password_hash_rejections = Counter(
+    "password_hash_rejections", "Hash jobs refused with 503 because the queue was full",
+)
+
+request_db_stats = ContextVar("request_db_stats", default=None)
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    # _do_get is where a checkout waits for a free connection
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_seconds.observe(time.perf_counter() - started)
+
+class MetricsMiddleware:
+    """Plain ASGI middleware (no BaseHTTPMiddleware overhead) timing every request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = {"queries": 0, "db_seconds": 0.0}
+        token = request_db_stats.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Label by route template ("/api/admin/users/{user_id}"), not the raw path
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_request_seconds.labels(scope["method"], route, str(status)).observe(time.perf_counter() - started)
+            http_request_db_queries.labels(route).observe(stats["queries"])
+            http_request_db_seconds.labels(route).observe(stats["db_seconds"])
+            request_db_stats.reset(token)
+
 
 # --- DATABASE CONFIG ---
 DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Connection pool tuning (ignored for SQLite, which is single-writer anyway)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", "2"))
+
+def make_async_url(url: str):
+    # Same DATABASE_URL as before, just pointed at the async drivers
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql+psycopg2://"):
+        return url.replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+def _record_query_time(conn, cursor, statement, parameters, context, executemany):
+    stats = request_db_stats.get()
+    if stats is not None:
+        stats["queries"] += 1
+        stats["db_seconds"] += time.perf_counter() - context._query_started
+
+def make_engine(url: str):
+    async_url = make_async_url(url)
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if not async_url.startswith("sqlite"):
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            poolclass=TimedAsyncQueuePool,
+        )
+    new_engine = create_async_engine(async_url, **options)
+    event.listen(new_engine.sync_engine, "before_cursor_execute", _start_query_timer)
+    event.listen(new_engine.sync_engine, "after_cursor_execute", _record_query_time)
+    return new_engine
+
+# Nothing touches the database at import: the engine is created by the app's
+# lifespan (or init_database() in scripts) and sessions are bound to it then.
+engine = None
+# expire_on_commit=False: objects stay readable after commit without another SELECT
+SessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
+
+def init_database():
+    global engine
+    if engine is None:
+        if not DATABASE_URL:
+            raise RuntimeError("DATABASE_URL is not set")
+        engine = make_engine(DATABASE_URL)
+        SessionLocal.configure(bind=engine)
+    return engine
+
+async def close_database():
+    global engine
+    if engine is not None:
+        await engine.dispose()
+        engine = None
 
 # ONLY ONE BASE DECLARATION
 Base = declarative_base()
 
-# --- NEW MODERN SECURITY HELPERS (Direct bcrypt) ---
-def get_password_hash(password: str):
-    # Bcrypt strictly requires bytes
-    pwd_bytes = password.encode('utf-8')
-    # Hard truncate to 72 bytes to avoid bcrypt error
-    pwd_bytes = pwd_bytes[:72]
-    # Generate salt and hash
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(pwd_bytes, salt)
-    return hashed.decode('utf-8')
-
-def verify_password(plain_password: str, hashed_password: str):
-    pwd_bytes = plain_password.encode('utf-8')
-    pwd_bytes = pwd_bytes[:72]
-    # Check if plain matches hashed
-    return bcrypt.checkpw(pwd_bytes, hashed_password.encode('utf-8'))
+# --- PASSWORD HASHING POOL ---
+# The bcrypt helpers live in passwords.py; here we only decide where they run.
+# A process pool escapes the GIL, and the slot semaphore caps how many hash jobs
+# can be queued so a login burst gets a fast 503 instead of stalling every route.
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+_hash_slots = asyncio.Semaphore(HASH_QUEUE_LIMIT)
+
+def get_hash_pool():
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            # "spawn" so workers don't inherit the app's threads or DB connections
+            _hash_pool = ProcessPoolExecutor(
+                max_workers=HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _hash_pool
+
+def shutdown_hash_pool():
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is not None:
+            _hash_pool.shutdown(cancel_futures=True)
+            _hash_pool = None
+
+def discard_broken_hash_pool(pool):
+    # A worker died (OOM kill, crash) and the executor refuses all work from then
+    # on; the next get_hash_pool() starts a fresh one. Only the first request to
+    # notice replaces it, the others find the new pool already in place.
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is pool:
+            _hash_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+async def run_hash_job(fn, *args):
+    if _hash_slots.locked():
+        password_hash_rejections.inc()
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please try again shortly",
+            headers={"Retry-After": str(HASH_RETRY_AFTER_SECONDS)},
+        )
+    started = time.perf_counter()
+    async with _hash_slots:
+        try:
+            for attempt in (1, 2):
+                pool = get_hash_pool()
+                try:
+                    return await asyncio.wrap_future(pool.submit(fn, *args))
+                except BrokenProcessPool:
+                    logger.warning("Hash worker pool broken, restarting it", extra={"attempt": attempt})
+                    discard_broken_hash_pool(pool)
+                    if attempt == 2:
+                        raise
+        finally:
+            password_hash_seconds.labels(fn.__name__).observe(time.perf_counter() - started)
+
+async def get_password_hash(password: str):
+    return await run_hash_job(passwords.get_password_hash, password, BCRYPT_ROUNDS)
+
+async def verify_password(plain_password: str, hashed_password: str):
+    return await run_hash_job(passwords.verify_password, plain_password, hashed_password)
+
+async def verify_and_rehash(plain_password: str, hashed_password: str):
+    return await run_hash_job(passwords.verify_and_rehash, plain_password, hashed_password, BCRYPT_ROUNDS)
+
+def token_claims(user):
+    return {"sub": user.email, "uid": user.id, "role": user.role, "ver": user.token_version or 0}
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -57,6 +389,12 @@ def create_access_token(data: dict):
 # --- MODELS ---
 class DBUser(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Keyset pagination / sorting of the admin user list, plus its filters
+        Index("ix_users_last_name_id", "last_name", "id"),
+        Index("ix_users_first_name_id", "first_name", "id"),
+        Index("ix_users_role_is_active", "role", "is_active"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
     first_name = Column(String)  # New field
@@ -64,23 +402,38 @@ class DBUser(Base):
     hashed_password = Column(String)
     role = Column(String, default="user")
     is_active = Column(Boolean, default=False)  # <-- Add this line
-    assessments = relationship("DBAssessment", back_populates="owner", cascade="all, delete-orphan")
-    detailed_assessments = relationship("DBDetailedAssessment", back_populates="owner", cascade="all, delete-orphan")
-    expert_assessments = relationship("DBExpertAssessment", back_populates="owner", cascade="all, delete-orphan")
+    # Copied into every token as "ver"; bumping it revokes all tokens issued before
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # passive_deletes: the rows go with ON DELETE CASCADE / delete_users, never loaded one by one
+    assessments = relationship("DBAssessment", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
+    detailed_assessments = relationship("DBDetailedAssessment", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
+    expert_assessments = relationship("DBExpertAssessment", back_populates="owner", cascade="all, delete-orphan", passive_deletes=True)
+    summary = relationship("DBUserSummary", uselist=False, cascade="all, delete-orphan")
+    progress = relationship("DBUserProgress", cascade="all, delete-orphan")
+
+# Case-insensitive prefix filters of the admin user list (see istartswith_indexed);
+# text_pattern_ops lets Postgres serve LIKE 'abc%' whatever the database collation
+for _column in ("first_name", "last_name", "email"):
+    Index(
+        f"ix_users_{_column}_lower", func.lower(DBUser.__table__.c[_column]).label(f"{_column}_lower"),
+        postgresql_ops={f"{_column}_lower": "text_pattern_ops"},
+    )
 
 class DBAssessment(Base):
     __tablename__ = "assessments"
     id = Column(Integer, primary_key=True, index=True)
     score = Column(Float)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     owner = relationship("DBUser", back_populates="assessments")
 
 class DBDetailedAssessment(Base):
+    # created_at comes back with the INSERT (RETURNING) for the progress trend
+    __mapper_args__ = {"eager_defaults": True}
     __tablename__ = "detailed_assessments"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Area 1: Ideas & Opportunities
@@ -107,15 +460,29 @@ class DBDetailedAssessment(Base):
     owner = relationship("DBUser", back_populates="detailed_assessments")
 
 # In main.py, add a new table for Expert Assessments
+class PackedThreadScores(TypeDecorator):
+    """Thread scores as a {thread_id: level} dict in Python, packed bytes in the
+    database (see pack_thread_scores). Reads and writes stay dicts everywhere."""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else pack_thread_scores(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else unpack_thread_scores(value)
+
 class DBExpertAssessment(Base):
+    # created_at comes back with the INSERT (RETURNING) for the progress trend
+    __mapper_args__ = {"eager_defaults": True}
     __tablename__ = "expert_assessments"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
-    # Store the 60 raw scores
-    thread_scores = Column(JSON)
+    # Store the raw thread scores, one byte each (PackedThreadScores)
+    thread_scores = Column(PackedThreadScores)
     
     # Pre-calculated competence averages (Matching constants.ts keys)
     spotting_opportunities = Column(Float)
@@ -141,10 +508,94 @@ class DBExpertAssessment(Base):
 # Don't forget to add the relationship to your DBUser class as well:
 # detailed_assessments = relationship("DBDetailedAssessment", back_populates="owner")
 
-# Tables are created AFTER models are defined
-Base.metadata.create_all(bind=engine)
+# One row per user pointing at their newest assessments, kept current on every insert,
+# so "latest" reads are primary-key lookups no matter how long the history is
+class DBUserSummary(Base):
+    __tablename__ = "user_summaries"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    latest_detailed_id = Column(Integer, ForeignKey("detailed_assessments.id", ondelete="SET NULL"))
+    latest_expert_id = Column(Integer, ForeignKey("expert_assessments.id", ondelete="SET NULL"))
+
+class DBUserProgress(Base):
+    """One row per user and assessment kind, updated in the submit transaction."""
+    __tablename__ = "user_progress"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    kind = Column(String, primary_key=True)  # "detailed" or "expert"
+    assessment_count = Column(Integer, nullable=False, default=0, server_default="0")
+    latest_id = Column(Integer)
+    latest_at = Column(DateTime(timezone=True))
+    means = Column(JSON)          # competence -> running mean over every assessment
+    latest_scores = Column(JSON)  # competence -> score of the newest assessment
+    deltas = Column(JSON)         # competence -> newest minus the one before, null until there are two
+    best_area = Column(String)
+    worst_area = Column(String)
+    trend = Column(JSON)          # last PROGRESS_TREND_POINTS of {id, created_at, average}
+
+class DBGroup(Base):
+    """A named set of users (a class, an intake) for batch actions and cohort filters."""
+    __tablename__ = "groups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False, unique=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class DBGroupMember(Base):
+    __tablename__ = "group_members"
+
+    group_id = Column(Integer, ForeignKey("groups.id", ondelete="CASCADE"), primary_key=True)
+    # Indexed on its own for "which groups is this user in" and the user-side cascade
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+# Per-user history lookups: newest first for a user is a single index range scan
+Index("ix_assessments_user_id_created_at", DBAssessment.user_id, DBAssessment.created_at.desc())
+Index("ix_detailed_assessments_user_id_created_at", DBDetailedAssessment.user_id, DBDetailedAssessment.created_at.desc())
+Index("ix_expert_assessments_user_id_created_at", DBExpertAssessment.user_id, DBExpertAssessment.created_at.desc())
+
+class DBAssessmentAggregate(Base):
+    """What archived assessments leave behind: count and means per user, kind and month."""
+    __tablename__ = "assessment_aggregates"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    kind = Column(String, primary_key=True)    # "detailed", "expert" or "legacy"
+    period = Column(String, primary_key=True)  # "YYYY-MM" of created_at
+    assessment_count = Column(Integer, nullable=False)
+    first_at = Column(DateTime(timezone=True))
+    last_at = Column(DateTime(timezone=True))
+    means = Column(JSON)  # competence (or "score" for legacy rows) -> mean over the month
+
+def archive_table(model):
+    # Same columns as the hot table, filled with INSERT ... SELECT so the stored bytes are copied as-is
+    source = model.__table__
+    return Table(
+        f"{source.name}_archive", Base.metadata,
+        *(Column(column.name, column.type, primary_key=column.primary_key, autoincrement=False) for column in source.columns),
+        Column("archived_at", DateTime(timezone=True), server_default=func.now()),
+        Index(f"ix_{source.name}_archive_user_id_created_at", "user_id", "created_at"),
+    )
+
+RETENTION_MODELS = {"detailed": DBDetailedAssessment, "expert": DBExpertAssessment, "legacy": DBAssessment}
+ARCHIVE_TABLES = {kind: archive_table(model) for kind, model in RETENTION_MODELS.items()}
 
 # --- SCHEMAS ---
+class CachedUser(BaseModel):
+    # What get_current_user hands to the routes: identity only, no password hash
+    id: int
+    email: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    role: str
+    is_active: bool
+    class Config: from_attributes = True
+
+class TokenClaims(BaseModel):
+    # Everything get_current_user needs, so auth itself never touches the users table
+    sub: str
+    uid: int
+    role: str
+    ver: int
+
 class UserCreate(BaseModel):
     email: EmailStr
     first_name: str  # Added
@@ -175,11 +626,68 @@ class UserManagementOut(BaseModel):
     email: str
     role: str
     is_active: bool
-    assessment_count: int  # <--- Add this line!
+    assessment_count: int  # detailed + expert
+    detailed_count: int
+    expert_count: int
 
     class Config:
         from_attributes = True
 
+class UserPageOut(BaseModel):
+    items: List[UserManagementOut]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
+
+class GroupCreate(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+
+class GroupOut(BaseModel):
+    id: int
+    name: str
+    created_at: Optional[datetime] = None
+    member_count: int = 0
+
+class GroupMembersIn(BaseModel):
+    user_ids: List[int] = Field(..., min_length=1, max_length=ADMIN_BATCH_MAX_IDS)
+
+class BatchUserAction(BaseModel):
+    # Targets the listed ids, every member of the group, or both
+    action: Literal["activate", "deactivate", "delete"]
+    user_ids: List[int] = Field(default_factory=list, max_length=ADMIN_BATCH_MAX_IDS)
+    group_id: Optional[int] = None
+
+class ProgressOut(BaseModel):
+    assessment_count: int
+    latest_id: Optional[int] = None
+    latest_at: Optional[datetime] = None
+    means: dict
+    latest_scores: dict
+    deltas: Optional[dict] = None
+    best_area: Optional[str] = None
+    worst_area: Optional[str] = None
+    trend: list
+    class Config: from_attributes = True
+
+class UserProgressOut(BaseModel):
+    user_id: int
+    detailed: Optional[ProgressOut] = None
+    expert: Optional[ProgressOut] = None
+
+class CompetenceComparisonOut(BaseModel):
+    # Percentiles are 0-100: the share of the cohort's latest scores below this one
+    self_score: Optional[float] = None
+    self_percentile: Optional[float] = None
+    self_cohort: Optional[int] = None
+    expert_score: Optional[float] = None
+    expert_percentile: Optional[float] = None
+    expert_cohort: Optional[int] = None
+    gap: Optional[float] = None  # expert minus self
+
+class ComparisonOut(BaseModel):
+    user_id: int
+    detailed_id: Optional[int] = None
+    expert_id: Optional[int] = None
+    competences: dict[str, CompetenceComparisonOut]
+
 class AssessmentSubmit(BaseModel):
     spotting_opportunities: int
     creativity: int
@@ -197,383 +705,2505 @@ class AssessmentSubmit(BaseModel):
     working_with_others: int
     learning_through_experience: int
 
+class DetailedAssessmentOut(AssessmentSubmit):
+    id: int
+    user_id: int
+    created_at: Optional[datetime] = None
+    class Config: from_attributes = True
 
+class AdminDetailedAssessmentOut(DetailedAssessmentOut):
+    user_name: str
 
-# --- EXPERT ASSESSMENT MAPPING ---
-# This maps the Thread IDs from expert-framework.ts to the 15 Competence keys
-EXPERT_MAPPING = {
-    "Ideas & Opportunities": {
-        "spotting_opportunities": ["so_seize", "so_challenges", "so_needs", "so_analyse"],
-        "creativity": ["cr_curious", "cr_develop", "cr_problems", "cr_value", "cr_innovative"],
-        "vision": ["vi_imagine", "vi_think", "vi_action"],
-        "valuing_ideas": ["vi_value", "vi_protect"],
-        "ethical_thinking": ["et_ethically", "et_sustainably", "et_impact", "et_accountable"]
-    },
-    "Resources": {
-        "self_awareness": ["sa_aspirations", "sa_sw", "sa_ability", "sa_future"],
-        "motivation": ["mp_driven", "mp_determined", "mp_focus", "mp_resilient", "mp_giveup"],
-        "mobilising_resources": ["mr_manage", "mr_responsibly", "mr_make", "mr_support"],
-        "financial_literacy": ["fel_understand", "fel_budget", "fel_funding", "fel_taxation"],
-        "mobilising_others": ["mo_inspire", "mo_persuade", "mo_communicate", "mo_media"]
-    },
-    "Into Action": {
-        "taking_initiative": ["ti_responsibility", "ti_independently", "ti_action"],
-        "planning_management": ["pm_goals", "pm_plan", "pm_develop", "pm_priorities", "pm_monitor", "pm_flexible"],
-        "coping_with_ambiguity": ["co_co", "co_calculate", "co_manage"],
-        "working_with_others": ["wo_accept", "wo_develop", "wo_listen", "wo_team", "wo_together", "wo_expand"],
-        "learning_through_experience": ["le_reflect", "le_learn", "le_experience"]
-    }
-}
+class ExpertAssessmentOut(BaseModel):
+    id: int
+    user_id: int
+    created_at: Optional[datetime] = None
+    thread_scores: dict
+    spotting_opportunities: Optional[float] = None
+    creativity: Optional[float] = None
+    vision: Optional[float] = None
+    valuing_ideas: Optional[float] = None
+    ethical_thinking: Optional[float] = None
+    self_awareness: Optional[float] = None
+    motivation: Optional[float] = None
+    mobilising_resources: Optional[float] = None
+    financial_literacy: Optional[float] = None
+    mobilising_others: Optional[float] = None
+    taking_initiative: Optional[float] = None
+    planning_management: Optional[float] = None
+    coping_with_ambiguity: Optional[float] = None
+    working_with_others: Optional[float] = None
+    learning_through_experience: Optional[float] = None
+    class Config: from_attributes = True
 
+class NoAssessmentOut(BaseModel):
+    message: str
 
-# --- APP ---
-app = FastAPI()
+class AdminNoAssessmentOut(NoAssessmentOut):
+    no_data: bool = True
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=[os.getenv("FRONTEND_URL", "http://localhost:3000")],
-    # allow_origin_regex="https://.*\.vercel\.app",
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+class MeOut(BaseModel):
+    email: str
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    role: str
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/login")
 
-def get_db():
-    db = SessionLocal()
-    try: yield db
-    finally: db.close()
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")  # This must match what you put in create_access_token
-        if email is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        # Querying by email is now required
-        user = db.query(DBUser).filter(DBUser.email == email).first()
-        if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        return user
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Could not validate credentials")
+# --- CACHE BACKENDS ---
+# Both backends store plain JSON-able dicts so they are interchangeable. The
+# methods are coroutines because the Redis one does network I/O on the event
+# loop; the local one never awaits anything.
+class LocalTTLCache:
+    """In-process TTL + LRU cache, the default and what backend/tests run against."""
 
-# --- ROUTES ---
-@app.post("/api/register", response_model=UserOut)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    if db.query(DBUser).filter(DBUser.email == user.email).first():
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    new_user = DBUser(
-        email=user.email,
-        first_name=user.first_name, # Updated
-        last_name=user.last_name,   # Updated
-        hashed_password=get_password_hash(user.password),
-        role="user" # Usually better to default to "user"
-    )
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        # Counters never expire or get evicted: a generation must not go back
+        self._counters = {}
+        self._lock = threading.Lock()
 
-@app.post("/api/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(DBUser).filter(DBUser.email == form_data.username).first()
-    
-    if not user or not verify_password(form_data.password, user.hashed_password):
-        raise HTTPException(status_code=401, detail="Incorrect email or password")
-    
-    # Check if the account is disabled
-    if not user.is_active:
-        raise HTTPException(
-            status_code=403, 
-            detail="Account disabled. Please contact an administrator for activation."
-        )
-    
-    token = create_access_token(data={"sub": user.email})
-    return {"access_token": token, "token_type": "bearer", "role": user.role}
+    async def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
 
-@app.post("/api/save")
-def save_assessment(data: AssessmentCreate, db: Session = Depends(get_db), current_user: DBUser = Depends(get_current_user)):
-    new_entry = DBAssessment(score=data.score, user_id=current_user.id)
-    db.add(new_entry)
-    db.commit()
-    db.refresh(new_entry)
-    return {"status": "success", "assessment_id": new_entry.id}
+    async def set(self, key: str, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
 
-@app.get("/api/hello")
-async def read_root():
-    return {"message": "Backend online"}
+    async def add(self, key: str, value, ttl_seconds: Optional[int] = None):
+        # Set only if absent (or expired); True when this call stored it
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] >= time.monotonic():
+                return False
+            self._data[key] = (time.monotonic() + (ttl_seconds or self.ttl_seconds), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            return True
 
+    async def set_many(self, items: dict):
+        for key, value in items.items():
+            await self.set(key, value)
 
-@app.get("/api/me")
-def get_me(current_user: DBUser = Depends(get_current_user)):
-    return {
-        "email": current_user.email,
-        "first_name": current_user.first_name,
-        "last_name": current_user.last_name,
-        "role": current_user.role
-    }
+    async def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
 
-@app.post("/api/change-password")
-def change_password(
-    request: PasswordChangeRequest, 
-    current_user: DBUser = Depends(get_current_user), 
-    db: Session = Depends(get_db)
-):
-    # 1. Verify the current password is correct using your helper
-    if not verify_password(request.current_password, current_user.hashed_password):
-        raise HTTPException(status_code=400, detail="Current password incorrect")
-    
-    # 2. Hash and update with the new password using your helper
-    current_user.hashed_password = get_password_hash(request.new_password)
-    db.commit()
-    
-    return {"message": "Password updated successfully"}
+    async def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
 
-@app.get("/api/admin/users", response_model=List[UserManagementOut])
-def get_all_users(
-    current_user: DBUser = Depends(get_current_user), 
-    db: Session = Depends(get_db)
-):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    # Efficiently query users and count their assessments in one go
-    results = db.query(
-        DBUser, 
-        func.count(DBDetailedAssessment.id).label("assessment_count")
-    ).outerjoin(DBDetailedAssessment).group_by(DBUser.id).all()
-    
-    users_output = []
-    for user, count in results:
-        # Create a dictionary from the user object
-        user_dict = {column.name: getattr(user, column.name) for column in user.__table__.columns}
-        user_dict["assessment_count"] = count
-        users_output.append(user_dict)
-        
-    return users_output
+    async def incr(self, key: str):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
 
-@app.patch("/api/admin/users/{user_id}/toggle-active")
-def toggle_user_active(
-    user_id: int, 
-    current_user: DBUser = Depends(get_current_user), 
-    db: Session = Depends(get_db)
-):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    target_user = db.query(DBUser).filter(DBUser.id == user_id).first()
-    if not target_user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    target_user.is_active = not target_user.is_active
-    db.commit()
-    return {"is_active": target_user.is_active}
+    async def counter(self, key: str):
+        return self._counters.get(key, 0)
 
-@app.delete("/api/admin/users/{user_id}")
-def delete_user(
-    user_id: int, 
-    db: Session = Depends(get_db), 
-    current_user: DBUser = Depends(get_current_user)
-):
-    # 1. Security Check: Only admins can delete users
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    # 2. Find the user
-    user_to_delete = db.query(DBUser).filter(DBUser.id == user_id).first()
-    if not user_to_delete:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # 3. Prevent self-deletion
-    if user_to_delete.id == current_user.id:
-        raise HTTPException(status_code=400, detail="Cannot delete your own admin account")
+class RedisCache:
+    """Shared backend so every uvicorn worker sees the same entries and invalidations."""
 
-    # 4. Clean up related data (Assessments)
-    # This ensures no "orphaned" assessments remain in the database
-    db.query(DBAssessment).filter(DBAssessment.user_id == user_id).delete()
-    
-    # 5. Delete the user and commit
-    db.delete(user_to_delete)
-    db.commit()
-    
-    return {"message": f"User {user_to_delete.email} and all their data have been deleted."}
+    def __init__(self, url: str, ttl_seconds: int, prefix: str):
+        import redis.asyncio  # Optional dependency, only needed when CACHE_URL is set
+        self._client = redis.asyncio.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
 
-@app.post("/api/assessments/detailed")
-def submit_detailed_assessment(
-    data: AssessmentSubmit, 
-    db: Session = Depends(get_db), 
-    current_user: DBUser = Depends(get_current_user)
-):
-    # Create the new record
-    new_result = DBDetailedAssessment(
-        user_id=current_user.id,
-        # This double asterisk (**) unpacks the dictionary 
-        # so 'creativity' in the JSON goes to the 'creativity' column
-        **data.dict() 
-    )
-    
-    try:
-        db.add(new_result)
-        db.commit()
-        db.refresh(new_result)
-        return {"message": "EntreComp assessment saved", "id": new_result.id}
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
-    
-@app.get("/api/assessments/latest")
-def get_latest_assessment(
-    db: Session = Depends(get_db), 
-    current_user: DBUser = Depends(get_current_user)
-):
-    # Fetch the most recent detailed assessment for this user
-    result = db.query(DBDetailedAssessment)\
-        .filter(DBDetailedAssessment.user_id == current_user.id)\
-        .order_by(DBDetailedAssessment.created_at.desc())\
-        .first()
-        
-    if not result:
-        return {"message": "No assessments found"}
-        
-    return result
+    async def get(self, key: str):
+        raw = await self._client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
 
-@app.get("/api/admin/users/{user_id}/latest")
-def get_user_latest_assessment_admin(
-    user_id: int,
-    db: Session = Depends(get_db),
-    current_user: DBUser = Depends(get_current_user)
-):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    target_user = db.query(DBUser).filter(DBUser.id == user_id).first()
-    if not target_user:
-        raise HTTPException(status_code=404, detail="User not found")
+    async def set(self, key: str, value):
+        await self._client.setex(self.prefix + key, self.ttl_seconds, json.dumps(value, default=str))
 
-    result = db.query(DBDetailedAssessment)\
-        .filter(DBDetailedAssessment.user_id == user_id)\
-        .order_by(DBDetailedAssessment.created_at.desc())\
-        .first()
-        
-    if not result:
-        # Return a specific structure so the frontend knows there's no data
-        return {"message": "No assessments found", "no_data": True}
-    
-    # Convert SQLAlchemy object to a standard Dictionary
-    response_data = {c.name: getattr(result, c.name) for c in result.__table__.columns}
-    response_data["user_name"] = f"{target_user.first_name} {target_user.last_name}"
-    
-    return response_data
+    async def set_many(self, items: dict):
+        async with self._client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.setex(self.prefix + key, self.ttl_seconds, json.dumps(value, default=str))
+            await pipe.execute()
 
-@app.get("/api/admin/users/{user_id}/assessments")
-def get_user_assessment_history(
-    user_id: int,
-    db: Session = Depends(get_db),
-    current_user: DBUser = Depends(get_current_user)
-):
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Forbidden")
+    async def add(self, key: str, value, ttl_seconds: Optional[int] = None):
+        return bool(await self._client.set(
+            self.prefix + key, json.dumps(value, default=str), ex=ttl_seconds or self.ttl_seconds, nx=True,
+        ))
 
-    target_user = db.query(DBUser).filter(DBUser.id == user_id).first()
-    records = db.query(DBDetailedAssessment)\
-        .filter(DBDetailedAssessment.user_id == user_id)\
-        .order_by(DBDetailedAssessment.created_at.desc())\
-        .all()
-
-    history = []
-    for r in records:
-        # Dynamically calculate avg score for the summary list
-        scores = [
-            r.spotting_opportunities, r.creativity, r.vision, r.valuing_ideas, r.ethical_thinking,
-            r.self_awareness, r.motivation, r.mobilising_resources, r.financial_literacy, r.mobilising_others,
-            r.taking_initiative, r.planning_management, r.coping_with_ambiguity, r.working_with_others, r.learning_through_experience
-        ]
-        history.append({
-            "id": r.id,
-            "created_at": r.created_at,
-            "avg_score": sum(scores) / 15
-        })
+    async def delete(self, key: str):
+        await self._client.delete(self.prefix + key)
 
-    return {
-        "user_name": f"{target_user.first_name} {target_user.last_name}",
-        "assessments": history
-    }
+    async def delete_many(self, keys):
+        keys = [self.prefix + key for key in keys]
+        if keys:
+            await self._client.delete(*keys)
 
-@app.post("/api/assessments/expert")
-def submit_expert_assessment(
-    scores: dict, 
-    db: Session = Depends(get_db),
-    current_user: DBUser = Depends(get_current_user)
-):
-    try:
-        calculated_results = {}
-        
-        # 1. Calculate the 15 Competence Averages
-        for area, competences in EXPERT_MAPPING.items():
-            for comp_key, thread_ids in competences.items():
-                relevant_scores = [scores.get(tid) for tid in thread_ids if scores.get(tid) is not None]
-                if relevant_scores:
-                    avg_score = sum(relevant_scores) / len(relevant_scores)
-                    calculated_results[comp_key] = round(avg_score, 2)
-                else:
-                    calculated_results[comp_key] = 0.0
-
-        # 2. Create the Instance explicitly to avoid "unpacking" errors
-        new_assessment = DBExpertAssessment(
-            user_id=current_user.id,
-            thread_scores=scores,  # This saves the raw 60 threads as JSON
-            # Manually map the 15 results
-            spotting_opportunities=calculated_results.get("spotting_opportunities", 0),
-            creativity=calculated_results.get("creativity", 0),
-            vision=calculated_results.get("vision", 0),
-            valuing_ideas=calculated_results.get("valuing_ideas", 0),
-            ethical_thinking=calculated_results.get("ethical_thinking", 0),
-            self_awareness=calculated_results.get("self_awareness", 0),
-            motivation=calculated_results.get("motivation", 0),
-            mobilising_resources=calculated_results.get("mobilising_resources", 0),
-            financial_literacy=calculated_results.get("financial_literacy", 0),
-            mobilising_others=calculated_results.get("mobilising_others", 0),
-            taking_initiative=calculated_results.get("taking_initiative", 0),
-            planning_management=calculated_results.get("planning_management", 0),
-            coping_with_ambiguity=calculated_results.get("coping_with_ambiguity", 0),
-            working_with_others=calculated_results.get("working_with_others", 0),
-            learning_through_experience=calculated_results.get("learning_through_experience", 0)
-        )
-        
-        # 3. Save and Commit
-        db.add(new_assessment)
-        print(f"DEBUG: Saving assessment for user {current_user.id}")
-        print(f"DEBUG: Thread Scores: {scores}")
-        print(f"DEBUG: Calculated results: {calculated_results}")
-        db.commit()
-        db.refresh(new_assessment) # This pulls the ID back from the DB
-        
+    async def incr(self, key: str):
+        # No expiry, same as the local counters
+        return await self._client.incr(self.prefix + key)
+
+    async def counter(self, key: str):
+        return int(await self._client.get(self.prefix + key) or 0)
+
+def make_cache_backend(prefix: str, max_entries: int, ttl_seconds: int):
+    if CACHE_URL:
+        return RedisCache(CACHE_URL, ttl_seconds, prefix)
+    return LocalTTLCache(max_entries, ttl_seconds)
+
+class UserCache:
+    """Caches CachedUser profiles by user id with hit/miss counters."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, user_id: int):
+        data = await self.backend.get(str(user_id))
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return CachedUser.model_validate(data)
+
+    async def set(self, user: DBUser):
+        cached = CachedUser.model_validate(user)
+        await self.backend.set(str(cached.id), cached.model_dump())
+        return cached
+
+    async def invalidate(self, *user_ids: int):
+        await self.backend.delete_many([str(user_id) for user_id in user_ids])
+
+    def stats(self):
+        lookups = self.hits + self.misses
         return {
-            "status": "success",
-            "assessment_id": new_assessment.id,
-            "results": calculated_results
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
         }
 
-    except Exception as e:
-        db.rollback() # Rollback if there is a DB error
-        print(f"ERROR SAVING EXPERT ASSESSMENT: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-    
+user_cache = UserCache(make_cache_backend("user:", USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS))
 
-@app.get("/api/assessments/expert/latest")
-def get_latest_expert_assessment(
-    db: Session = Depends(get_db),
-    current_user: DBUser = Depends(get_current_user)
-):
-    assessment = db.query(DBExpertAssessment).filter(
-        DBExpertAssessment.user_id == current_user.id
-    ).order_by(DBExpertAssessment.created_at.desc()).first()
-    
-    if not assessment:
-        raise HTTPException(status_code=404, detail="No assessment found")
-        
-    return assessment
\ No newline at end of file
+class UserCacheCollector:
+    # Exposes the cache's own counters on /metrics
+    def collect(self):
+        yield CounterMetricFamily("user_cache_hits", "User profile cache hits", value=user_cache.hits)
+        yield CounterMetricFamily("user_cache_misses", "User profile cache misses", value=user_cache.misses)
+
+REGISTRY.register(UserCacheCollector())
+
+# Stored for deleted users, never equal to a real "ver" claim
+REVOKED = -1
+
+class TokenVersions:
+    """Current token version per user id, the only per-request auth check.
+
+    A token is honoured while its "ver" claim equals the user's token_version.
+    Toggling the account, changing the password or deleting the user moves the
+    version, which revokes every earlier token at once. Entries are filled from
+    the database on first use. With CACHE_URL they live in Redis next to the
+    user cache and a revocation is seen by every worker at once; in-process
+    they expire after TOKEN_VERSION_LOCAL_TTL_SECONDS, which bounds how long
+    another worker can still accept a revoked token.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def current(self, db: AsyncSession, user_id: int, claimed: int):
+        version = await self.backend.get(str(user_id))
+        # Versions only go up, so a token ahead of the cached entry means this worker
+        # missed a bump published by another one (a password change hands out such a
+        # token at once): the entry is stale, not the token. Deletions stay revoked.
+        if version is None or (version != REVOKED and version < claimed):
+            version = await db.scalar(select(DBUser.token_version).where(DBUser.id == user_id))
+            version = REVOKED if version is None else version
+            await self.backend.set(str(user_id), version)
+        return version
+
+    async def set(self, versions: dict):
+        await self.backend.set_many({str(user_id): version for user_id, version in versions.items()})
+
+token_versions = TokenVersions(
+    RedisCache(CACHE_URL, USER_CACHE_TTL_SECONDS, "token-version:") if CACHE_URL
+    else LocalTTLCache(USER_CACHE_MAX_ENTRIES, TOKEN_VERSION_LOCAL_TTL_SECONDS)
+)
+
+def bump_token_version(user: DBUser):
+    # Call before the commit, then publish_token_versions(...) after it
+    user.token_version = (user.token_version or 0) + 1
+
+class IdempotencyClaim:
+    """One submit's hold on its Idempotency-Key, as handed out by IdempotencyKeys.claim()."""
+
+    def __init__(self, keys, user_id: int, key: Optional[str], payload):
+        self.keys = keys
+        self.cache_key = f"{user_id}:{key}" if key else None
+        self.fingerprint = keys.fingerprint(payload)
+        self.replay = None  # the JSONResponse to send back instead of running the request
+        self.owned = False
+        self.stored = False
+
+    async def store(self, response: dict):
+        """Keeps the response for later retries and returns it."""
+        if self.owned:
+            await self.keys.backend.set(self.cache_key, {"request": self.fingerprint, "response": response})
+            self.stored = True
+        return response
+
+class IdempotencyKeys:
+    """Stored responses of submits sent with an Idempotency-Key header, per user.
+
+    A submit route runs inside claim():
+
+        async with idempotency_keys.claim(user.id, key, payload) as claim:
+            if claim.replay is not None:
+                return claim.replay
+            ...  # write and commit
+            response = await claim.store({...})
+
+    claim() reserves the key with a pending entry (set-if-absent), so a second
+    copy arriving while the first is still running gets a 409 rather than a
+    duplicate row. Once the commit is done, store() keeps the response and
+    later retries get it back without touching the database. A key reused
+    with a different body is a client bug and gets a 422.
+
+    The pending entry lives IDEMPOTENCY_PENDING_SECONDS only, and leaving the
+    block without store() (an error, an HTTPException, a cancelled request)
+    releases it, so a failed request does not lock its key out.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def fingerprint(payload):
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+    async def _reserve(self, claim: IdempotencyClaim):
+        # The entry can expire between a refused add() and the get(): then try again
+        for _ in range(3):
+            if await self.backend.add(claim.cache_key, {"request": claim.fingerprint}, IDEMPOTENCY_PENDING_SECONDS):
+                claim.owned = True
+                return
+            entry = await self.backend.get(claim.cache_key)
+            if entry is None:
+                continue
+            if entry.get("request") != claim.fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+            if "response" not in entry:
+                break
+            claim.replay = JSONResponse(content=entry["response"], headers={"Idempotent-Replayed": "true"})
+            return
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+
+    @asynccontextmanager
+    async def claim(self, user_id: int, key: Optional[str], payload):
+        claim = IdempotencyClaim(self, user_id, key, payload)
+        if key:
+            await self._reserve(claim)
+        try:
+            yield claim
+        finally:
+            # Nothing was stored for the claim: let a retry run the request again
+            if claim.owned and not claim.stored:
+                await self.backend.delete(claim.cache_key)
+
+idempotency_keys = IdempotencyKeys(
+    make_cache_backend("idempotency:", IDEMPOTENCY_MAX_ENTRIES, IDEMPOTENCY_TTL_SECONDS),
+)
+
+# --- RATE LIMITING ---
+# Token buckets: each key holds up to `attempts` tokens and regains them evenly
+# over `seconds`. Per-IP buckets are checked in middleware before routing, the
+# per-account ones at the top of the route, so a refused attempt never reaches
+# the database or bcrypt.
+class LocalBucketStore:
+    """In-process buckets with LRU eviction, the default and what backend/tests run against."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, attempts: int, seconds: float):
+        """Returns 0 when a token was taken, else the seconds until the next one."""
+        now = time.monotonic()
+        rate = attempts / seconds
+        tokens, updated = self._buckets.pop(key, (attempts, now))
+        tokens = min(attempts, tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return 0 if allowed else (1 - tokens) / rate
+
+class RedisBucketStore:
+    """Shared buckets; the refill-and-take runs as one Lua script so it stays atomic."""
+
+    SCRIPT = """
+    local attempts, rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated")
+    local tokens = tonumber(bucket[1]) or attempts
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(attempts, tokens + (now - updated) * rate)
+    local wait = 0
+    if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+    redis.call("HSET", KEYS[1], "tokens", tokens, "updated", now)
+    redis.call("EXPIRE", KEYS[1], math.ceil(attempts / rate))
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis.asyncio  # Optional dependency, only needed when RATE_LIMIT_URL is set
+        self._client = redis.asyncio.Redis.from_url(url)
+        self._take = self._client.register_script(self.SCRIPT)
+        self.prefix = prefix
+
+    async def take(self, key: str, attempts: int, seconds: float):
+        return float(await self._take(keys=[self.prefix + key], args=[attempts, attempts / seconds, time.time()]))
+
+def make_bucket_store():
+    if RATE_LIMIT_URL:
+        return RedisBucketStore(RATE_LIMIT_URL)
+    return LocalBucketStore(RATE_LIMIT_MAX_KEYS)
+
+rate_limit_store = make_bucket_store()
+
+def too_many_requests(retry_after: float):
+    return {"Retry-After": str(max(1, math.ceil(retry_after)))}
+
+async def limit_account(route: str, account):
+    # Call before touching the database: refuses the attempt with 429 once the account's bucket is empty
+    attempts, seconds = RATE_LIMITS_PER_ACCOUNT[route]
+    retry_after = await rate_limit_store.take(f"account:{route}:{str(account).lower()}", attempts, seconds)
+    if retry_after:
+        rate_limited_total.labels(route, "account").inc()
+        raise HTTPException(
+            status_code=429, detail="Too many attempts for this account, try again later",
+            headers=too_many_requests(retry_after),
+        )
+
+class RateLimitMiddleware:
+    """Per-client-IP buckets for the routes in RATE_LIMITS_PER_IP (POST only).
+
+    The IP is the ASGI client address; behind a proxy run uvicorn with
+    --proxy-headers so that is the real client and not the proxy.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        route = scope["path"] if scope["type"] == "http" and scope["method"] == "POST" else None
+        if route in RATE_LIMITS_PER_IP:
+            attempts, seconds = RATE_LIMITS_PER_IP[route]
+            client = (scope.get("client") or ("unknown",))[0]
+            retry_after = await rate_limit_store.take(f"ip:{route}:{client}", attempts, seconds)
+            if retry_after:
+                rate_limited_total.labels(route, "ip").inc()
+                response = JSONResponse(
+                    {"detail": "Too many requests, try again later"}, status_code=429,
+                    headers=too_many_requests(retry_after),
+                )
+                return await response(scope, receive, send)
+        await self.app(scope, receive, send)
+
+
+# --- ASSESSMENT FRAMEWORK ---
+# Areas, competences and threads (with the level descriptors the frontend shows)
+# come from framework/*.json, one file per version, compiled once at import into
+# read-only lookups. A released file is never edited: a change is a new version,
+# and rows packed under an older version keep decoding with its thread order.
+class Framework:
+    def __init__(self, definition: dict):
+        self.version = definition["version"]
+        if not 1 <= self.version <= 255:
+            raise ValueError("Framework versions go from 1 to 255 (they are stored in one byte)")
+        areas = definition["areas"]
+        self.areas = tuple(area["name"] for area in areas)
+        self.competences = tuple(comp["id"] for area in areas for comp in area["competences"])
+        self.thread_ids = tuple(
+            thread["id"] for area in areas for comp in area["competences"] for thread in comp["threads"]
+        )
+        if len(set(self.thread_ids)) != len(self.thread_ids) or len(set(self.competences)) != len(self.competences):
+            raise ValueError(f"Framework version {self.version} repeats a competence or thread id")
+        self.thread_index = MappingProxyType({tid: i for i, tid in enumerate(self.thread_ids)})
+        self.competence_area = MappingProxyType({
+            comp["id"]: area["name"] for area in areas for comp in area["competences"]
+        })
+        self.mapping = MappingProxyType({
+            area["name"]: MappingProxyType({
+                comp["id"]: tuple(thread["id"] for thread in comp["threads"]) for comp in area["competences"]
+            })
+            for area in areas
+        })
+        # A competence's threads are contiguous in thread_ids
+        self.competence_slices = {}
+        offset = 0
+        for comps in self.mapping.values():
+            for comp, tids in comps.items():
+                self.competence_slices[comp] = slice(offset, offset + len(tids))
+                offset += len(tids)
+        self.competence_slices = MappingProxyType(self.competence_slices)
+        # Served as-is by /api/framework
+        self.body = json.dumps(definition, ensure_ascii=False, separators=(",", ":")).encode()
+        self.digest = hashlib.sha256(self.body).hexdigest()[:16]
+
+def load_frameworks(directory: str):
+    frameworks = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            compiled = Framework(json.load(f))
+        if compiled.version in frameworks:
+            raise RuntimeError(f"Two framework files declare version {compiled.version}")
+        frameworks[compiled.version] = compiled
+    if not frameworks:
+        raise RuntimeError(f"No framework definitions in {directory}")
+    return frameworks
+
+FRAMEWORKS = load_frameworks(FRAMEWORK_DIR)
+framework = FRAMEWORKS[FRAMEWORK_VERSION or max(FRAMEWORKS)]
+
+# New competences still need their columns on the assessment tables
+for _model in (DBDetailedAssessment, DBExpertAssessment):
+    _missing = set(framework.competences) - set(_model.__table__.columns.keys())
+    if _missing:
+        raise RuntimeError(f"{_model.__tablename__} has no column for: {', '.join(sorted(_missing))}")
+
+# --- EXPERT SCORING ENGINE ---
+# Compiled once at import from the framework: every thread gets a fixed column,
+# and 0/1 membership matrices fold the thread columns into the competences and
+# those into the areas. Scoring N submissions is then two matrix products
+# instead of a dict walk.
+class ExpertScoringEngine:
+    def __init__(self, framework: Framework):
+        self.areas = list(framework.areas)
+        self.competences = list(framework.competences)
+        self.thread_ids = list(framework.thread_ids)
+        self.thread_index = framework.thread_index
+
+        # threads x competences, and competences x areas
+        self.competence_matrix = np.zeros((len(self.thread_ids), len(self.competences)))
+        self.area_matrix = np.zeros((len(self.competences), len(self.areas)))
+        for c, comp in enumerate(self.competences):
+            self.competence_matrix[framework.competence_slices[comp], c] = 1
+            self.area_matrix[c, self.areas.index(framework.competence_area[comp])] = 1
+
+    # IDs that older frontend builds still send, and the thread each stands for
+    legacy_thread_ids = {"pm_ priorities": "pm_priorities"}
+
+    def canonical(self, scores: dict):
+        """Returns the scores keyed by current thread IDs, renaming legacy ones."""
+        if not scores.keys() & self.legacy_thread_ids.keys():
+            return scores
+        renamed = {}
+        for tid, value in scores.items():
+            tid = self.legacy_thread_ids.get(tid, tid)
+            if tid in renamed:
+                raise ValueError(f"Duplicate score for {tid}")
+            renamed[tid] = value
+        return renamed
+
+    def validate(self, scores: dict):
+        # Raises ValueError on unknown thread IDs or non-numeric scores
+        unknown = scores.keys() - self.thread_index.keys()
+        if unknown:
+            raise ValueError(f"Unknown thread IDs: {', '.join(sorted(unknown))}")
+        for tid, value in scores.items():
+            if value is not None and type(value) not in (int, float):
+                raise ValueError(f"Score for {tid} must be a number")
+            # Whole levels only: they are stored one byte each. JSON lets
+            # Infinity and NaN through, and int() raises on those
+            if value is not None and (
+                not math.isfinite(value) or value != int(value) or not 1 <= value <= 255
+            ):
+                raise ValueError(f"Score for {tid} must be a whole number from 1 to 255")
+
+    def to_matrix(self, submissions: list, validate: bool = True):
+        """Packs thread-score dicts into an N x threads float array, NaN where a
+        thread was not answered."""
+        rows = []
+        for scores in submissions:
+            if validate:
+                self.validate(scores)
+            rows.append([scores.get(tid) for tid in self.thread_ids])
+        # None becomes NaN in a float array
+        return np.array(rows, dtype=float).reshape(len(rows), len(self.thread_ids))
+
+    @staticmethod
+    def _nan_mean(values: np.ndarray, membership: np.ndarray):
+        # Mean over the members of each group, ignoring NaN; NaN if a group is empty
+        answered = ~np.isnan(values)
+        sums = np.where(answered, values, 0.0) @ membership
+        counts = answered.astype(float) @ membership
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+    def score_matrix(self, matrix: np.ndarray):
+        """Returns (competence_scores N x 15, area_scores N x 3), NaN where nothing was answered."""
+        competence_scores = self._nan_mean(matrix, self.competence_matrix)
+        area_scores = self._nan_mean(competence_scores, self.area_matrix)
+        return competence_scores, area_scores
+
+    def score_batch(self, submissions: list, validate: bool = True):
+        return self.score_matrix(self.to_matrix(submissions, validate))
+
+    def results(self, competence_row: np.ndarray):
+        # One row of scores in the shape the API has always returned:
+        # rounded competence averages, 0.0 for a competence with no answers
+        return {
+            comp: 0.0 if np.isnan(value) else round(float(value), 2)
+            for comp, value in zip(self.competences, competence_row)
+        }
+
+    def score(self, scores: dict):
+        competence_scores, _ = self.score_batch([scores])
+        return self.results(competence_scores[0])
+
+scoring_engine = ExpertScoringEngine(framework)
+
+
+# --- PACKED THREAD SCORES ---
+# Stored layout: one version byte, then one byte per thread in the order pinned
+# for that version, 0 meaning "not answered". That is 61 bytes per row instead
+# of ~1 kB of JSON keyed by thread id. The version byte is the framework version,
+# so every framework file ever released must stay in framework/ (migration 0005
+# pins its own copy of version 1).
+THREAD_LAYOUTS = {version: compiled.thread_ids for version, compiled in FRAMEWORKS.items()}
+THREAD_LAYOUT_VERSION = framework.version
+
+def pack_thread_scores(scores: dict):
+    layout = THREAD_LAYOUTS[THREAD_LAYOUT_VERSION]
+    unknown = scores.keys() - set(layout)
+    if unknown:
+        raise ValueError(f"Unknown thread IDs: {', '.join(sorted(unknown))}")
+    values = [scores.get(tid) for tid in layout]
+    return bytes([THREAD_LAYOUT_VERSION, *(0 if value is None else int(value) for value in values)])
+
+def unpack_thread_scores(packed: bytes):
+    layout = THREAD_LAYOUTS[packed[0]]
+    return {tid: value for tid, value in zip(layout, packed[1:]) if value}
+
+
+# --- LATEST ASSESSMENT POINTERS ---
+def dialect_insert(db: AsyncSession, model):
+    # INSERT ... ON CONFLICT lives in the dialect packages
+    if db.bind.dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+async def set_latest_pointer(db: AsyncSession, user_id: int, **pointer):
+    # Called in the same transaction as the insert of a brand new (hence newest) assessment
+    statement = dialect_insert(db, DBUserSummary).values(user_id=user_id, **pointer)
+    await db.execute(statement.on_conflict_do_update(index_elements=["user_id"], set_=pointer))
+
+async def refresh_latest_pointers(db: AsyncSession, model, field: str, user_ids: list):
+    # Set-based recompute for imports, where rows can carry older created_at values
+    user_ids = list(user_ids)
+    for i in range(0, len(user_ids), BULK_INSERT_CHUNK):
+        ranked = select(
+            model.user_id, model.id,
+            func.row_number().over(
+                partition_by=model.user_id,
+                order_by=(model.created_at.desc(), model.id.desc()),
+            ).label("rn"),
+        ).where(model.user_id.in_(user_ids[i:i + BULK_INSERT_CHUNK])).subquery()
+        latest = select(ranked.c.user_id, ranked.c.id).where(ranked.c.rn == 1)
+        statement = dialect_insert(db, DBUserSummary).from_select(["user_id", field], latest)
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=["user_id"], set_={field: statement.excluded[field]},
+        ))
+
+
+# --- PROGRESS SUMMARIES ---
+# Running means, last-vs-previous deltas and a short trend per user and kind, so
+# progress views read one row however many assessments the learner has taken.
+PROGRESS_MODELS = {"detailed": DBDetailedAssessment, "expert": DBExpertAssessment}
+PROGRESS_KINDS = {model: kind for kind, model in PROGRESS_MODELS.items()}
+
+def area_means(scores: dict):
+    return {
+        area: sum(scores[comp] for comp in comps) / len(comps)
+        for area, comps in framework.mapping.items()
+    }
+
+def trend_point(assessment_id: int, created_at, scores: dict):
+    average = sum(scores.values()) / len(scores)
+    return {"id": assessment_id, "created_at": created_at.isoformat(), "average": round(average, 2)}
+
+def progress_columns(count: int, means: dict, latest: dict, previous: Optional[dict], trend: list):
+    areas = area_means(latest)
+    return {
+        "assessment_count": count,
+        "latest_id": trend[-1]["id"],
+        "latest_at": datetime.fromisoformat(trend[-1]["created_at"]),
+        "means": means,
+        "latest_scores": latest,
+        "deltas": {comp: round(latest[comp] - previous[comp], 2) for comp in latest} if previous else None,
+        "best_area": max(areas, key=areas.get),
+        "worst_area": min(areas, key=areas.get),
+        "trend": trend[-PROGRESS_TREND_POINTS:],
+    }
+
+async def record_progress(db: AsyncSession, user_id: int, kind: str, assessment):
+    """Folds one saved assessment into the user's progress row; safe to run twice."""
+    created = await db.execute(
+        dialect_insert(db, DBUserProgress).values(user_id=user_id, kind=kind).on_conflict_do_nothing()
+    )
+    if created.rowcount:
+        # No row yet: the user may have history from before progress tracking, start from all of it
+        await rebuild_progress(db, kind, [user_id])
+        return
+
+    # Row lock so two submits of the same user cannot both read the old count
+    progress = await db.scalar(
+        select(DBUserProgress)
+        .where(DBUserProgress.user_id == user_id, DBUserProgress.kind == kind)
+        .with_for_update()
+    )
+    if any(point["id"] == assessment.id for point in progress.trend):
+        return  # already counted: a retried job, or a rebuild that ran after the insert
+    if assessment.id < progress.latest_id:
+        # Arrived out of order, so "latest" and the deltas would be wrong if folded in
+        await rebuild_progress(db, kind, [user_id])
+        return
+    model = PROGRESS_MODELS[kind]
+    previous_id = await db.scalar(
+        select(func.max(model.id)).where(model.user_id == user_id, model.id < assessment.id)
+    )
+    if previous_id != progress.latest_id:
+        # The job of an assessment in between was lost (failed for good, or died with
+        # its worker): the counts are off by that row, so start over from the history
+        await rebuild_progress(db, kind, [user_id])
+        return
+
+    scores = {comp: getattr(assessment, comp) for comp in scoring_engine.competences}
+    count = progress.assessment_count + 1
+    means = {comp: progress.means[comp] + (value - progress.means[comp]) / count for comp, value in scores.items()}
+    trend = [*progress.trend, trend_point(assessment.id, assessment.created_at, scores)]
+    for column, value in progress_columns(count, means, scores, progress.latest_scores, trend).items():
+        setattr(progress, column, value)
+
+async def newest_archived_scores(db: AsyncSession, kind: str, user_ids: list):
+    """{user_id: scores} of each user's newest archived assessment of this kind."""
+    archive = ARCHIVE_TABLES[kind]
+    ranked = select(
+        archive.c.user_id, *(archive.c[comp] for comp in scoring_engine.competences),
+        func.row_number().over(
+            partition_by=archive.c.user_id, order_by=(archive.c.created_at.desc(), archive.c.id.desc()),
+        ).label("rn"),
+    ).where(archive.c.user_id.in_(user_ids)).subquery()
+    result = await db.execute(select(ranked).where(ranked.c.rn == 1))
+    return {row.user_id: {comp: getattr(row, comp) for comp in scoring_engine.competences} for row in result}
+
+async def rebuild_progress(db: AsyncSession, kind: str, user_ids: list):
+    # Full recompute from history, for imports (rows can arrive out of date order)
+    # and for users whose history predates the progress table
+    model = PROGRESS_MODELS[kind]
+    columns = [getattr(model, comp) for comp in scoring_engine.competences]
+    user_ids = list(user_ids)
+    for i in range(0, len(user_ids), BULK_INSERT_CHUNK):
+        result = await db.execute(
+            select(model.user_id, model.id, model.created_at, *columns)
+            .where(model.user_id.in_(user_ids[i:i + BULK_INSERT_CHUNK]))
+            .order_by(model.user_id, model.created_at, model.id)
+        )
+        history = {}
+        for row in result:
+            history.setdefault(row.user_id, []).append(row)
+        # Archived months count towards the means and the total (see RETENTION)
+        archived = {}
+        for aggregate in await db.scalars(
+            select(DBAssessmentAggregate)
+            .where(DBAssessmentAggregate.kind == kind, DBAssessmentAggregate.user_id.in_(user_ids[i:i + BULK_INSERT_CHUNK]))
+        ):
+            count, sums = archived.get(aggregate.user_id, (0, dict.fromkeys(scoring_engine.competences, 0.0)))
+            for comp in scoring_engine.competences:
+                sums[comp] += aggregate.means[comp] * aggregate.assessment_count
+            archived[aggregate.user_id] = (count + aggregate.assessment_count, sums)
+        # The latest row is never archived, but the one before it may be: the deltas need it
+        previous_archived = await newest_archived_scores(
+            db, kind, [user_id for user_id, rows in history.items() if len(rows) == 1 and user_id in archived],
+        )
+
+        for user_id, rows in history.items():
+            all_scores = [{comp: getattr(row, comp) for comp in scoring_engine.competences} for row in rows]
+            archived_count, archived_sums = archived.get(user_id, (0, dict.fromkeys(scoring_engine.competences, 0.0)))
+            means = {
+                comp: (archived_sums[comp] + sum(scores[comp] for scores in all_scores)) / (archived_count + len(all_scores))
+                for comp in scoring_engine.competences
+            }
+            trend = [
+                trend_point(row.id, row.created_at, scores)
+                for row, scores in zip(rows[-PROGRESS_TREND_POINTS:], all_scores[-PROGRESS_TREND_POINTS:])
+            ]
+            previous = all_scores[-2] if len(rows) > 1 else previous_archived.get(user_id)
+            values = progress_columns(archived_count + len(rows), means, all_scores[-1], previous, trend)
+            statement = dialect_insert(db, DBUserProgress).values(user_id=user_id, kind=kind, **values)
+            await db.execute(statement.on_conflict_do_update(index_elements=["user_id", "kind"], set_=values))
+
+
+async def load_progress(db: AsyncSession, user_id: int):
+    """Both progress rows of a user in one primary-key read, as a UserProgressOut."""
+    rows = {p.kind: p for p in await db.scalars(select(DBUserProgress).where(DBUserProgress.user_id == user_id))}
+    if len(rows) < len(PROGRESS_MODELS):
+        # A kind without a row but with a latest pointer has history from before progress tracking
+        summary = await db.get(DBUserSummary, user_id)
+        missing = [
+            kind for kind in PROGRESS_MODELS
+            if kind not in rows and summary is not None and getattr(summary, f"latest_{kind}_id")
+        ]
+        for kind in missing:
+            await rebuild_progress(db, kind, [user_id])
+        if missing:
+            await db.commit()
+            rows = {p.kind: p for p in await db.scalars(
+                select(DBUserProgress).where(DBUserProgress.user_id == user_id).execution_options(populate_existing=True)
+            )}
+    return UserProgressOut(user_id=user_id, **rows)
+
+
+# --- USER GROUPS & BATCH ACTIONS ---
+# Admin actions over many users are one UPDATE / one DELETE per table for the
+# whole selection, whatever its size; caches are fixed up after the commit.
+def group_member_ids(group_id: int):
+    return select(DBGroupMember.user_id).where(DBGroupMember.group_id == group_id)
+
+def selected_users(user_ids: list, group_id: Optional[int], exclude_id: Optional[int] = None):
+    """WHERE clause on DBUser for explicit ids and/or a group's members."""
+    conditions = []
+    if user_ids:
+        conditions.append(DBUser.id.in_(user_ids))
+    if group_id is not None:
+        conditions.append(DBUser.id.in_(group_member_ids(group_id)))
+    condition = or_(*conditions)
+    if exclude_id is not None:
+        condition = and_(condition, DBUser.id != exclude_id)
+    return condition
+
+async def set_users_active(db: AsyncSession, condition, active: bool):
+    # Only rows that actually change get a new token version
+    statement = update(DBUser)\
+        .where(condition, DBUser.is_active.is_not(active))\
+        .values(is_active=active, token_version=DBUser.token_version + 1)\
+        .returning(DBUser.id, DBUser.token_version)\
+        .execution_options(synchronize_session=False)
+    return dict((await db.execute(statement)).all())
+
+async def delete_users(db: AsyncSession, condition):
+    """Delete the selected users and everything they own, children first.
+
+    Does not rely on ON DELETE CASCADE being enforced (SQLite leaves foreign
+    keys off by default). Returns {user_id: REVOKED} for publish_token_versions.
+    """
+    user_ids = (await db.scalars(select(DBUser.id).where(condition))).all()
+    for i in range(0, len(user_ids), BULK_INSERT_CHUNK):
+        chunk = user_ids[i:i + BULK_INSERT_CHUNK]
+        # Summaries first: they point at the assessment rows
+        for table in (
+            DBUserSummary.__table__, DBUserProgress.__table__, DBGroupMember.__table__, DBAssessmentAggregate.__table__,
+            *(model.__table__ for model in RETENTION_MODELS.values()), *ARCHIVE_TABLES.values(),
+        ):
+            await db.execute(delete(table).where(table.c.user_id.in_(chunk)))
+        await db.execute(delete(DBUser).where(DBUser.id.in_(chunk)).execution_options(synchronize_session=False))
+    return {user_id: REVOKED for user_id in user_ids}
+
+async def publish_token_versions(versions: dict):
+    # After the commit, so a concurrent request can't re-cache the old version
+    await token_versions.set(versions)
+    await user_cache.invalidate(*versions)
+
+# --- BULK INGESTION ---
+# Bodies can be a JSON array, NDJSON (one object per line) or CSV with a header.
+# Every record names its owner with "email" or "user_id" and may carry an
+# ISO "created_at" (when the assessment was actually taken in the LMS).
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+OWNER_FIELDS = ("email", "user_id", "created_at")
+
+def _csv_value(value: str):
+    # CSV cells are text: empty means missing, numbers are converted, the rest is left for validation
+    if value is None or value.strip() == "":
+        return None
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+def body_too_large():
+    return HTTPException(status_code=413, detail=f"At most {BULK_MAX_BYTES} bytes per request")
+
+async def read_bulk_body(request: Request):
+    # Refused before it is buffered: on the declared Content-Length, and for chunked
+    # uploads (no length) as soon as the bytes received go over the cap
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > BULK_MAX_BYTES:
+        raise body_too_large()
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > BULK_MAX_BYTES:
+            raise body_too_large()
+    return bytes(body)
+
+async def read_bulk_records(request: Request):
+    """Returns a list of (record, error) pairs, one per input row."""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    text = (await read_bulk_body(request)).decode("utf-8-sig")
+
+    if content_type == "text/csv":
+        rows = [
+            ({key: _csv_value(value) for key, value in row.items() if key}, None)
+            for row in csv.DictReader(io.StringIO(text))
+        ]
+    elif content_type in NDJSON_TYPES:
+        rows = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append((json.loads(line), None))
+            except json.JSONDecodeError as e:
+                rows.append((None, f"Invalid JSON: {e.msg}"))
+    else:
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e.msg}")
+        if not isinstance(data, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of records")
+        rows = [(record, None) for record in data]
+
+    if len(rows) > BULK_MAX_RECORDS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_RECORDS} records per request")
+    return [
+        (record, error) if error or isinstance(record, dict) else (None, "Record must be an object")
+        for record, error in rows
+    ]
+
+async def resolve_owners(db: AsyncSession, records: list):
+    # One query per chunk of emails / ids instead of one per record
+    emails = {r["email"] for r in records if r and r.get("email")}
+    user_ids = {int(r["user_id"]) for r in records if r and str(r.get("user_id") or "").isdigit()}
+    by_email, known_ids = {}, set()
+    emails, user_ids = list(emails), list(user_ids)
+    for i in range(0, max(len(emails), len(user_ids)), BULK_INSERT_CHUNK):
+        result = await db.execute(
+            select(DBUser.id, DBUser.email).where(or_(
+                DBUser.email.in_(emails[i:i + BULK_INSERT_CHUNK]),
+                DBUser.id.in_(user_ids[i:i + BULK_INSERT_CHUNK]),
+            ))
+        )
+        for user_id, email in result:
+            by_email[email] = user_id
+            known_ids.add(user_id)
+    return by_email, known_ids
+
+def owner_and_timestamp(record: dict, by_email: dict, known_ids: set, now: datetime):
+    # Raises ValueError with a per-row message
+    if record.get("email"):
+        user_id = by_email.get(record["email"])
+    elif str(record.get("user_id") or "").isdigit():
+        user_id = int(record["user_id"])
+        user_id = user_id if user_id in known_ids else None
+    else:
+        raise ValueError("Each record needs an email or user_id")
+    if user_id is None:
+        raise ValueError("User not found")
+
+    created_at = record.get("created_at")
+    if created_at:
+        try:
+            created_at = datetime.fromisoformat(str(created_at))
+        except ValueError:
+            raise ValueError("created_at must be an ISO 8601 timestamp")
+    return user_id, created_at or now
+
+def validation_message(error: ValidationError):
+    return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in error.errors())
+
+async def insert_in_chunks(db: AsyncSession, model, rows: list):
+    # executemany-style INSERT ... RETURNING, ids come back in input order
+    ids = []
+    statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+    for i in range(0, len(rows), BULK_INSERT_CHUNK):
+        result = await db.execute(statement, rows[i:i + BULK_INSERT_CHUNK])
+        ids.extend(result.scalars().all())
+    return ids
+
+async def store_bulk_rows(db: AsyncSession, model, pointer_field: str, results: list, rows: list, row_numbers: list):
+    # All chunks share one transaction: either the whole import lands or none of it
+    user_ids = sorted({row["user_id"] for row in rows})
+    try:
+        ids = await insert_in_chunks(db, model, rows)
+        await refresh_latest_pointers(db, model, pointer_field, user_ids)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    await after_bulk_import(PROGRESS_KINDS[model], user_ids)
+
+    for row_number, new_id in zip(row_numbers, ids):
+        results[row_number] = {"row": row_number, "status": "created", "id": new_id}
+    failed = sum(1 for r in results if r["status"] == "error")
+    return {"received": len(results), "created": len(ids), "failed": failed, "results": results}
+
+
+# --- EXPORTS ---
+# Rows are streamed from a server-side cursor in EXPORT_BATCH_SIZE partitions and
+# encoded partition by partition, so memory stays flat however big the table is.
+EXPORT_MODELS = {"detailed": DBDetailedAssessment, "expert": DBExpertAssessment}
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+
+class _ParquetSink:
+    # Write-only file object for ParquetWriter; we drain it after every row group
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+async def stream_export_rows(query):
+    # Own session: the response body outlives the request's get_db session
+    async with SessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for partition in result.mappings().partitions():
+            yield partition
+
+def load_pyarrow():
+    # Imported on the first Parquet export rather than by every worker at startup
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            return False
+        pa, pq = pyarrow, pyarrow.parquet
+    return True
+
+def flatten_thread_scores(row: dict):
+    scores = row.pop("thread_scores") or {}
+    for tid in scoring_engine.thread_ids:
+        row[tid] = scores.get(tid)
+    return row
+
+def export_arrow_schema(columns: list, kind: str, flatten_threads: bool):
+    score_type = pa.int64() if kind == "detailed" else pa.float64()
+    fields = []
+    for name in columns:
+        if name in ("id", "user_id"):
+            fields.append(pa.field(name, pa.int64()))
+        elif name == "created_at":
+            fields.append(pa.field(name, pa.timestamp("us", tz="UTC")))
+        elif name == "thread_scores":
+            fields.append(pa.field(name, pa.string()))  # JSON text of the decoded dict
+        elif flatten_threads and name in scoring_engine.thread_index:
+            fields.append(pa.field(name, pa.float64()))
+        else:
+            fields.append(pa.field(name, score_type))
+    return pa.schema(fields)
+
+async def encode_export(query, kind: str, export_format: str, columns: list, flatten_threads: bool):
+    if export_format == "csv":
+        yield (",".join(columns) + "\n").encode()
+    if export_format == "parquet":
+        sink = _ParquetSink()
+        schema = export_arrow_schema(columns, kind, flatten_threads)
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+
+    async for partition in stream_export_rows(query):
+        rows = [dict(row) for row in partition]
+        if flatten_threads:
+            rows = [flatten_thread_scores(row) for row in rows]
+
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer_csv = csv.writer(buffer)
+            for row in rows:
+                writer_csv.writerow([
+                    json.dumps(value) if isinstance(value, dict) else value
+                    for value in (row[name] for name in columns)
+                ])
+            yield buffer.getvalue().encode()
+        elif export_format == "ndjson":
+            yield "".join(json.dumps(row, default=str) + "\n" for row in rows).encode()
+        else:
+            for row in rows:
+                if "thread_scores" in row and row["thread_scores"] is not None:
+                    row["thread_scores"] = json.dumps(row["thread_scores"])
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            yield sink.drain()
+
+    if export_format == "parquet":
+        writer.close()
+        yield sink.drain()
+
+
+# --- COHORT ANALYTICS ---
+# Distributions over every user's latest assessment, computed in the database:
+# the latest rows come through the summary pointers, get unpivoted into
+# (dimension, key, value) rows, and window functions rank them for percentiles.
+ANALYTICS_PERCENTILES = (10, 25, 50, 75, 90)
+ANALYTICS_MODELS = {
+    "expert": (DBExpertAssessment, DBUserSummary.latest_expert_id),
+    "detailed": (DBDetailedAssessment, DBUserSummary.latest_detailed_id),
+}
+
+analytics_cache = (
+    RedisCache(CACHE_URL, ANALYTICS_CACHE_TTL_SECONDS, "analytics:") if CACHE_URL
+    else LocalTTLCache(256, ANALYTICS_LOCAL_CACHE_TTL_SECONDS)
+)
+
+async def invalidate_analytics():
+    # Any new or removed assessment changes the cohort numbers. Entries are keyed
+    # by generation, so moving it on orphans them all in one INCR (no key scan);
+    # they age out with their TTL.
+    await analytics_cache.incr("generation")
+
+def histogram_bucket(value):
+    # Levels run 1-8: bucket n holds [n, n+1), written as a CASE so it works on every backend
+    return case(*[(value < level + 1, level) for level in range(1, 8)], else_=8)
+
+def analytics_queries(kind: str, filters: list):
+    model, pointer = ANALYTICS_MODELS[kind]
+    latest = select(model.user_id, *(getattr(model, comp) for comp in scoring_engine.competences))\
+        .join(DBUserSummary, pointer == model.id)\
+        .join(DBUser, DBUser.id == model.user_id)\
+        .where(*filters).cte("latest")
+
+    # 0 means "not answered" in both tables, so it is left out of the statistics
+    competence_scores = union_all(*[
+        select(
+            latest.c.user_id,
+            literal(framework.competence_area[comp]).label("area"),
+            literal(comp).label("key"),
+            latest.c[comp].label("value"),
+        ).where(latest.c[comp] > 0)
+        for comp in scoring_engine.competences
+    ]).cte("competence_scores")
+    area_scores = select(
+        competence_scores.c.user_id,
+        competence_scores.c.area.label("key"),
+        func.avg(competence_scores.c.value).label("value"),
+    ).group_by(competence_scores.c.user_id, competence_scores.c.area).cte("area_scores")
+    values = union_all(
+        select(literal("competences").label("dimension"), competence_scores.c.key, competence_scores.c.value),
+        select(literal("areas").label("dimension"), area_scores.c.key, area_scores.c.value),
+    ).cte("analytics_values")
+
+    partition = (values.c.dimension, values.c.key)
+    ranked = select(
+        values.c.dimension, values.c.key, values.c.value,
+        func.row_number().over(partition_by=partition, order_by=values.c.value).label("rn"),
+        func.count().over(partition_by=partition).label("n"),
+    ).subquery()
+    # Nearest-rank percentile: the value at rank ceil(n * p / 100)
+    stats = select(
+        ranked.c.dimension, ranked.c.key,
+        func.count().label("count"),
+        func.avg(ranked.c.value).label("mean"),
+        func.avg(ranked.c.value * ranked.c.value).label("mean_square"),
+        func.min(ranked.c.value).label("min"),
+        func.max(ranked.c.value).label("max"),
+        *[
+            func.max(case((ranked.c.rn == (ranked.c.n * p + 99) // 100, ranked.c.value))).label(f"p{p}")
+            for p in ANALYTICS_PERCENTILES
+        ],
+    ).group_by(ranked.c.dimension, ranked.c.key)
+
+    bucket = histogram_bucket(values.c.value).label("bucket")
+    histogram = select(values.c.dimension, values.c.key, bucket, func.count().label("count"))\
+        .group_by(values.c.dimension, values.c.key, bucket)
+    return stats, histogram
+
+async def compute_analytics(db: AsyncSession, kind: str, filters: list):
+    stats_query, histogram_query = analytics_queries(kind, filters)
+    result = {"competences": {}, "areas": {}}
+    for row in (await db.execute(stats_query)).mappings():
+        mean = float(row["mean"])
+        result[row["dimension"]][row["key"]] = {
+            "count": row["count"],
+            "mean": round(mean, 3),
+            # Population stddev from E[x^2] - E[x]^2 (SQLite has no STDDEV)
+            "stddev": round(math.sqrt(max(float(row["mean_square"]) - mean * mean, 0.0)), 3),
+            "min": round(float(row["min"]), 3),
+            "max": round(float(row["max"]), 3),
+            **{f"p{p}": round(float(row[f"p{p}"]), 3) for p in ANALYTICS_PERCENTILES},
+            "histogram": {str(level): 0 for level in range(1, 9)},
+        }
+    for row in (await db.execute(histogram_query)).mappings():
+        result[row["dimension"]][row["key"]]["histogram"][str(row["bucket"])] = row["count"]
+    return result
+
+
+async def cohort_analytics(
+    db: AsyncSession, kind: list, date_from=None, date_to=None, is_active=None, role=None, group_id=None,
+):
+    """Cached analytics response for one filter combination."""
+    generation = await analytics_cache.counter("generation")
+    cache_key = f"{generation}:" + json.dumps(
+        {
+            "kind": sorted(kind), "from": date_from, "to": date_to, "active": is_active, "role": role,
+            "group": group_id,
+        },
+        default=str, sort_keys=True,
+    )
+    cached = await analytics_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    response = {"generated_at": datetime.now(timezone.utc).isoformat()}
+    for k in sorted(kind):
+        model, _ = ANALYTICS_MODELS[k]
+        filters = []
+        if date_from:
+            filters.append(model.created_at >= date_from)
+        if date_to:
+            filters.append(model.created_at < date_to)
+        if is_active is not None:
+            filters.append(DBUser.is_active == is_active)
+        if role:
+            filters.append(DBUser.role == role)
+        if group_id is not None:
+            filters.append(DBUser.id.in_(group_member_ids(group_id)))
+        response[k] = await compute_analytics(db, k, filters)
+
+    await analytics_cache.set(cache_key, response)
+    return response
+
+# Self vs expert vs cohort: the same unpivot over everyone's latest rows, ranked
+# with percent_rank and then narrowed to one user, so it is a single round trip
+COMPARISON_PREFIXES = {"detailed": "self", "expert": "expert"}
+
+def comparison_query(user_id: int):
+    branches = []
+    for kind, (model, pointer) in ANALYTICS_MODELS.items():
+        latest = select(model.id, model.user_id, *(getattr(model, comp) for comp in scoring_engine.competences))\
+            .join(DBUserSummary, pointer == model.id).cte(f"latest_{kind}")
+        branches += [
+            select(
+                literal(kind).label("kind"), latest.c.id, latest.c.user_id,
+                literal(comp).label("key"), cast(latest.c[comp], Float).label("value"),
+            ).where(latest.c[comp] > 0)
+            for comp in scoring_engine.competences
+        ]
+    values = union_all(*branches).subquery()
+
+    partition = (values.c.kind, values.c.key)
+    ranked = select(
+        values.c.kind, values.c.id, values.c.user_id, values.c.key, values.c.value,
+        func.percent_rank().over(partition_by=partition, order_by=values.c.value).label("percentile"),
+        func.count().over(partition_by=partition).label("cohort"),
+    ).subquery()
+    # The filter has to sit outside the window, or the user would be ranked against themselves
+    return select(ranked).where(ranked.c.user_id == user_id)
+
+async def compare_with_cohort(db: AsyncSession, user_id: int):
+    result = {"user_id": user_id, "competences": {comp: {} for comp in scoring_engine.competences}}
+    for row in (await db.execute(comparison_query(user_id))).mappings():
+        prefix = COMPARISON_PREFIXES[row["kind"]]
+        result[f"{row['kind']}_id"] = row["id"]
+        result["competences"][row["key"]].update({
+            f"{prefix}_score": round(row["value"], 3),
+            f"{prefix}_percentile": round(row["percentile"] * 100, 1),
+            f"{prefix}_cohort": row["cohort"],
+        })
+    for comparison in result["competences"].values():
+        if "self_score" in comparison and "expert_score" in comparison:
+            comparison["gap"] = round(comparison["expert_score"] - comparison["self_score"], 3)
+    return result
+
+
+# --- BACKGROUND JOBS ---
+# Follow-up work after a submit (progress rows, analytics warm-up, webhooks) runs
+# on a few worker tasks instead of inside the request. Jobs are plain JSON
+# {"name", "payload", "attempt", "key"} so the queue can live in Redis as well.
+# A full queue refuses new jobs; callers then do the work inline.
+JOB_HANDLERS = {}
+
+def job_handler(name: str):
+    def register(fn):
+        JOB_HANDLERS[name] = fn
+        return fn
+    return register
+
+class LocalJobBackend:
+    """Bounded in-process queue, the default and the stand-in for Redis."""
+
+    def __init__(self, limit: int):
+        self._queue = asyncio.Queue(limit)
+        self._keys = set()
+
+    async def push(self, job: dict):
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def claim_key(self, key: str, ttl_seconds: float):
+        # One process, one queue: nothing can die holding a key, so no expiry
+        if key in self._keys:
+            return False
+        self._keys.add(key)
+        return True
+
+    async def release_key(self, key: str):
+        self._keys.discard(key)
+
+    async def pop(self):
+        return await self._queue.get()
+
+    def depth(self):
+        return self._queue.qsize()
+
+class RedisJobBackend:
+    """Redis list shared by every uvicorn worker (LPUSH / BRPOP)."""
+
+    def __init__(self, url: str, limit: int, key: str = "jobs"):
+        import redis.asyncio  # Optional dependency, only needed when JOB_QUEUE_URL is set
+        self._client = redis.asyncio.Redis.from_url(url)
+        self.limit = limit
+        self.key = key
+        self._depth = 0
+
+    async def push(self, job: dict):
+        self._depth = await self._client.llen(self.key)
+        if self._depth >= self.limit:
+            return False
+        await self._client.lpush(self.key, json.dumps(job, default=str))
+        return True
+
+    async def pop(self):
+        _, raw = await self._client.brpop(self.key)
+        return json.loads(raw)
+
+    async def claim_key(self, key: str, ttl_seconds: float):
+        # Shared by every worker, so whichever one pops the job can free it
+        return bool(await self._client.set(f"{self.key}:waiting:{key}", 1, nx=True, ex=math.ceil(ttl_seconds)))
+
+    async def release_key(self, key: str):
+        await self._client.delete(f"{self.key}:waiting:{key}")
+
+    def depth(self):
+        # Last length seen on push; good enough for a gauge
+        return self._depth
+
+class JobQueue:
+    def __init__(self, backend, workers: int, max_attempts: int, retry_seconds: float):
+        self.backend = backend
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self._tasks = []
+        self._delayed = set()  # the loop only keeps weak references to tasks
+
+    async def enqueue(self, name: str, payload: dict, key: Optional[str] = None, delay: float = 0):
+        """Returns False when the queue is full. A job whose key is already waiting is
+        folded into that one (and counts as accepted). The key is held in the backend,
+        so this works across workers, and is freed when a worker starts the job."""
+        if key is not None and not await self.backend.claim_key(key, delay + JOB_KEY_TTL_SECONDS):
+            return True
+        job = {"name": name, "payload": payload, "attempt": 1, "key": key}
+        if delay:
+            self._push_later(job, delay)
+            accepted = True
+        else:
+            accepted = await self.backend.push(job)
+        if not accepted:
+            if key is not None:
+                await self.backend.release_key(key)
+            jobs_total.labels(name, "rejected").inc()
+            logger.warning("Job queue full", extra={"job": name})
+        return accepted
+
+    def _push_later(self, job: dict, delay: float):
+        async def push():
+            await asyncio.sleep(delay)
+            if not await self.backend.push(job):
+                if job["key"] is not None:
+                    await self.backend.release_key(job["key"])
+                jobs_total.labels(job["name"], "rejected").inc()
+                logger.warning("Job queue full, dropping delayed job", extra={"job": job["name"]})
+        task = asyncio.create_task(push())
+        self._delayed.add(task)
+        task.add_done_callback(self._delayed.discard)
+
+    async def _run(self, job: dict):
+        if job["key"] is not None and job["attempt"] == 1:
+            # From here on a new job with this key is new work, not a duplicate
+            await self.backend.release_key(job["key"])
+        started = time.perf_counter()
+        try:
+            await JOB_HANDLERS[job["name"]](**job["payload"])
+            jobs_total.labels(job["name"], "ok").inc()
+        except Exception:
+            if job["attempt"] < self.max_attempts:
+                # Exponential backoff: retry_seconds, 2x, 4x, ...
+                delay = self.retry_seconds * 2 ** (job["attempt"] - 1)
+                jobs_total.labels(job["name"], "retried").inc()
+                logger.warning("Job failed, retrying", exc_info=True, extra={"job": job["name"], "attempt": job["attempt"]})
+                self._push_later({**job, "attempt": job["attempt"] + 1}, delay)
+            else:
+                jobs_total.labels(job["name"], "failed").inc()
+                logger.exception("Job failed", extra={"job": job["name"], "payload": job["payload"]})
+        finally:
+            job_seconds.labels(job["name"]).observe(time.perf_counter() - started)
+
+    async def _worker(self):
+        while True:
+            await self._run(await self.backend.pop())
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float):
+        # Give local jobs a moment to finish, then cancel whatever is still running
+        deadline = time.monotonic() + timeout
+        while self.backend.depth() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        tasks = [*self._tasks, *self._delayed]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+
+def make_job_backend():
+    if JOB_QUEUE_URL:
+        return RedisJobBackend(JOB_QUEUE_URL, JOB_QUEUE_LIMIT)
+    return LocalJobBackend(JOB_QUEUE_LIMIT)
+
+job_queue = JobQueue(make_job_backend(), JOB_WORKERS, JOB_MAX_ATTEMPTS, JOB_RETRY_SECONDS)
+job_queue_depth.set_function(lambda: job_queue.backend.depth())
+
+@job_handler("progress")
+async def progress_job(user_id: int, kind: str, assessment_id: int):
+    async with SessionLocal() as db:
+        assessment = await db.get(PROGRESS_MODELS[kind], assessment_id)
+        if assessment is None:
+            return  # deleted in the meantime
+        await record_progress(db, user_id, kind, assessment)
+        await db.commit()
+
+@job_handler("rebuild_progress")
+async def rebuild_progress_job(kind: str, user_ids: list):
+    async with SessionLocal() as db:
+        await rebuild_progress(db, kind, user_ids)
+        await db.commit()
+
+@job_handler("warm_analytics")
+async def warm_analytics_job():
+    # Recompute the unfiltered dashboard numbers so the next admin visit hits the cache
+    async with SessionLocal() as db:
+        await cohort_analytics(db, list(ANALYTICS_MODELS))
+
+@job_handler("notify")
+async def notify_job(event: str, **data):
+    request = urllib.request.Request(
+        NOTIFY_WEBHOOK_URL,
+        data=json.dumps({"event": event, **data}, default=str).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    # urllib raises on non-2xx, which makes the job retry
+    await asyncio.to_thread(lambda: urllib.request.urlopen(request, timeout=10).close())
+
+async def run_or_enqueue(name: str, payload: dict):
+    # Work that must happen: done inline when the queue pushes back
+    if not await job_queue.enqueue(name, payload):
+        await JOB_HANDLERS[name](**payload)
+
+async def after_bulk_import(kind: str, user_ids: list):
+    await invalidate_analytics()
+    if user_ids:
+        await run_or_enqueue("rebuild_progress", {"kind": kind, "user_ids": user_ids})
+    await job_queue.enqueue("warm_analytics", {}, key="warm_analytics", delay=ANALYTICS_WARM_DELAY_SECONDS)
+
+async def after_assessment_saved(user_id: int, kind: str, assessment_id: int):
+    """Follow-ups of a committed submit; only the progress row is mandatory."""
+    await invalidate_analytics()
+    await run_or_enqueue("progress", {"user_id": user_id, "kind": kind, "assessment_id": assessment_id})
+    await job_queue.enqueue("warm_analytics", {}, key="warm_analytics", delay=ANALYTICS_WARM_DELAY_SECONDS)
+    if NOTIFY_WEBHOOK_URL:
+        await job_queue.enqueue(
+            "notify", {"event": "assessment.created", "user_id": user_id, "kind": kind, "assessment_id": assessment_id},
+        )
+
+
+# --- RETENTION ---
+# Old assessments leave the hot tables in batches: each batch is folded into the
+# monthly aggregates, copied to the archive table and deleted, in one transaction.
+# A row a summary pointer names as someone's latest is never moved, so latest
+# reads, ETags, comparisons and analytics never notice. Progress rebuilds and the
+# admin counts add the aggregates back in.
+def retention_columns(kind: str):
+    # The values the aggregate means are taken over
+    model = RETENTION_MODELS[kind]
+    return [model.score] if kind == "legacy" else [getattr(model, comp) for comp in scoring_engine.competences]
+
+def retention_condition(kind: str, cutoff: datetime):
+    model = RETENTION_MODELS[kind]
+    if kind == "legacy":
+        # No pointer for the legacy table: keep each user's highest id
+        keep = model.id.in_(select(func.max(DBAssessment.id)).group_by(DBAssessment.user_id))
+    else:
+        _, pointer = ANALYTICS_MODELS[kind]
+        keep = exists().where(pointer == model.id)
+    return and_(model.created_at < cutoff, ~keep)
+
+async def average_row_bytes(db: AsyncSession, kind: str, condition):
+    """Bytes per hot row, for the reclaimed-space report; None if the backend can't tell."""
+    model = RETENTION_MODELS[kind]
+    table = model.__tablename__
+    if db.bind.dialect.name == "postgresql":
+        size = func.avg(func.pg_column_size(literal_column(f"{table}.*")))
+        return float(await db.scalar(select(size).select_from(model).where(condition)) or 0)
+    try:
+        # Table pages / rows; SQLite only has this with the dbstat virtual table compiled in
+        table_bytes = await db.scalar(text("SELECT sum(pgsize) FROM dbstat WHERE name = :name"), {"name": table})
+    except DBAPIError:
+        return None
+    rows = await db.scalar(select(func.count()).select_from(model))
+    return table_bytes / rows if rows else 0.0
+
+async def merge_aggregates(db: AsyncSession, kind: str, rows: list):
+    names = [column.key for column in retention_columns(kind)]
+    groups = {}
+    for row in rows:
+        group = groups.setdefault((row.user_id, row.created_at.strftime("%Y-%m")), {
+            "assessment_count": 0, "sums": dict.fromkeys(names, 0.0),
+            "first_at": row.created_at, "last_at": row.created_at,
+        })
+        group["assessment_count"] += 1
+        for name in names:
+            group["sums"][name] += getattr(row, name) or 0
+        group["first_at"] = min(group["first_at"], row.created_at)
+        group["last_at"] = max(group["last_at"], row.created_at)
+
+    # An earlier run may have archived part of the same month already
+    existing = await db.scalars(
+        select(DBAssessmentAggregate).where(
+            DBAssessmentAggregate.kind == kind,
+            DBAssessmentAggregate.user_id.in_({user_id for user_id, _ in groups}),
+            DBAssessmentAggregate.period.in_({period for _, period in groups}),
+        ).with_for_update()
+    )
+    for aggregate in existing:
+        group = groups.get((aggregate.user_id, aggregate.period))
+        if group is None:
+            continue
+        group["assessment_count"] += aggregate.assessment_count
+        for name in names:
+            group["sums"][name] += aggregate.means[name] * aggregate.assessment_count
+        group["first_at"] = min(group["first_at"], aggregate.first_at)
+        group["last_at"] = max(group["last_at"], aggregate.last_at)
+
+    for (user_id, period), group in groups.items():
+        values = {
+            "assessment_count": group["assessment_count"],
+            "first_at": group["first_at"],
+            "last_at": group["last_at"],
+            "means": {name: total / group["assessment_count"] for name, total in group["sums"].items()},
+        }
+        statement = dialect_insert(db, DBAssessmentAggregate).values(user_id=user_id, kind=kind, period=period, **values)
+        await db.execute(statement.on_conflict_do_update(index_elements=["user_id", "kind", "period"], set_=values))
+    return len(groups)
+
+async def archive_old_rows(db: AsyncSession, kind: str, cutoff: datetime, dry_run: bool):
+    model = RETENTION_MODELS[kind]
+    condition = retention_condition(kind, cutoff)
+    summary = (await db.execute(
+        select(func.count(), func.count(model.user_id.distinct()), func.min(model.created_at)).where(condition)
+    )).one()
+    row_bytes = await average_row_bytes(db, kind, condition) if summary[0] else 0.0
+    report = {
+        "rows": summary[0],
+        "users": summary[1],
+        "oldest": summary[2],
+        "bytes": None if row_bytes is None else round(row_bytes * summary[0]),
+    }
+    if dry_run or not summary[0]:
+        return report
+
+    archive = ARCHIVE_TABLES[kind]
+    source_columns = list(model.__table__.columns)
+    report["aggregates"] = 0
+    moved = 0
+    while True:
+        # SKIP LOCKED lets two runs (or a run and a user delete) share the table on Postgres
+        rows = (await db.execute(
+            select(model.id, model.user_id, model.created_at, *retention_columns(kind))
+            .where(condition).order_by(model.id).limit(RETENTION_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )).all()
+        if not rows:
+            break
+        batch = model.id.in_([row.id for row in rows])
+        report["aggregates"] += await merge_aggregates(db, kind, rows)
+        await db.execute(
+            insert(archive).from_select([column.name for column in source_columns], select(*source_columns).where(batch))
+        )
+        await db.execute(delete(model).where(batch).execution_options(synchronize_session=False))
+        await db.commit()
+        moved += len(rows)
+    report["rows"] = moved
+    report["bytes"] = None if row_bytes is None else round(row_bytes * moved)
+    return report
+
+async def apply_retention(db: AsyncSession, days: int = RETENTION_DAYS, dry_run: bool = True):
+    """Archive assessments older than `days`; dry_run only counts. Returns the report."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    report = {"cutoff": cutoff, "dry_run": dry_run, "tables": {}}
+    for kind in RETENTION_MODELS:
+        report["tables"][kind] = await archive_old_rows(db, kind, cutoff, dry_run)
+    sizes = [table["bytes"] for table in report["tables"].values()]
+    report["rows"] = sum(table["rows"] for table in report["tables"].values())
+    report["bytes"] = None if None in sizes else sum(sizes)
+    return report
+
+@job_handler("retention")
+async def retention_job(days: int):
+    async with SessionLocal() as db:
+        report = await apply_retention(db, days, dry_run=False)
+    # JsonFormatter serialises the datetimes in the report
+    logger.info("Retention run finished", extra={"report": report})
+
+# --- APP ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log_listener.start()
+    init_database()
+    # Schema changes belong to `alembic upgrade head`; create_all is a dev/test shortcut
+    if AUTO_CREATE_SCHEMA:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    job_queue.start()
+    yield
+    await job_queue.stop(JOB_DRAIN_SECONDS)
+    shutdown_hash_pool()
+    await close_database()
+    log_listener.stop()
+
+app = FastAPI(lifespan=lifespan)
+
+app.add_middleware(RateLimitMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=[os.getenv("FRONTEND_URL", "http://localhost:3000")],
+    # allow_origin_regex="https://.*\.vercel\.app",
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/login")
+
+async def get_db():
+    async with SessionLocal() as db:
+        yield db
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+
+    # Tokens from before the uid/role/ver claims only carry "sub": those have to log in again
+    try:
+        claims = TokenClaims.model_validate(payload)
+    except ValidationError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    # Identity and role come straight from the claims; the version check is the only
+    # lookup, and it is served from memory after the first request of each user
+    if await token_versions.current(db, claims.uid, claims.ver) != claims.ver:
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    # Tokens are only issued to active users and deactivation bumps the version
+    return CachedUser(id=claims.uid, email=claims.sub, role=claims.role, is_active=True)
+
+# --- CONDITIONAL GET ---
+# Assessments are never edited, so "which row is the latest" is the whole version:
+# the ETag is built from the pointer id and a matching If-None-Match is answered
+# with 304 before the row itself is read.
+RESPONSE_SCHEMA_VERSION = 1
+
+def make_etag(*parts):
+    return '"' + "-".join(str(part) for part in (f"v{RESPONSE_SCHEMA_VERSION}", *parts)) + '"'
+
+def etag_matches(request: Request, etag: str):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates or "*" in candidates
+
+def set_cache_headers(response: Response, etag: str):
+    # Per-user data: browsers may keep it but must revalidate, shared caches must not store it
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.headers["Vary"] = "Authorization"
+
+def not_modified(etag: str):
+    response = Response(status_code=304)
+    set_cache_headers(response, etag)
+    return response
+
+def set_public_cache_headers(response: Response, etag: str):
+    # Same for every caller: shared caches may keep it, everyone revalidates
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "public, no-cache"
+
+async def latest_pointer(db: AsyncSession, user_id: int, pointer):
+    return await db.scalar(select(pointer).where(DBUserSummary.user_id == user_id))
+
+
+# --- ROUTES ---
+@app.post("/api/register", response_model=UserOut)
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    if await db.scalar(select(DBUser.id).where(DBUser.email == user.email)):
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    new_user = DBUser(
+        email=user.email,
+        first_name=user.first_name, # Updated
+        last_name=user.last_name,   # Updated
+        hashed_password=await get_password_hash(user.password),
+        role="user" # Usually better to default to "user"
+    )
+    db.add(new_user)
+    await db.commit()
+    return new_user
+
+@app.post("/api/login")
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    await limit_account("/api/login", form_data.username)
+    user = await db.scalar(select(DBUser).where(DBUser.email == form_data.username))
+    if not user:
+        raise HTTPException(status_code=401, detail="Incorrect email or password")
+
+    password_ok, new_hash = await verify_and_rehash(form_data.password, user.hashed_password)
+    if not password_ok:
+        raise HTTPException(status_code=401, detail="Incorrect email or password")
+
+    # Stored with an old cost factor: upgrade it now that we know the plain password
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+    
+    # Check if the account is disabled
+    if not user.is_active:
+        raise HTTPException(
+            status_code=403, 
+            detail="Account disabled. Please contact an administrator for activation."
+        )
+    
+    token = create_access_token(data=token_claims(user))
+    return {"access_token": token, "token_type": "bearer", "role": user.role}
+
+@app.post("/api/save")
+async def save_assessment(
+    data: AssessmentCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+):
+    async with idempotency_keys.claim(current_user.id, idempotency_key, data.model_dump()) as claim:
+        if claim.replay is not None:
+            return claim.replay
+        new_entry = DBAssessment(score=data.score, user_id=current_user.id)
+        db.add(new_entry)
+        await db.commit()
+        return await claim.store({"status": "success", "assessment_id": new_entry.id})
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/api/health/live", include_in_schema=False)
+async def liveness():
+    # The process is up and serving; says nothing about the database
+    return {"status": "ok"}
+
+@app.get("/api/health/ready", include_in_schema=False)
+async def readiness():
+    # Ready to take traffic: the engine exists and the database answers in time
+    if engine is None:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.scalar(select(literal(1)))
+
+    try:
+        await asyncio.wait_for(ping(), READINESS_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning("Readiness check failed", extra={"error": repr(e)})
+        return JSONResponse({"status": "unavailable", "database": type(e).__name__}, status_code=503)
+    return {"status": "ok", "database": "ok"}
+
+@app.get("/api/framework")
+async def get_framework(request: Request, version: Optional[int] = None):
+    # Public and static per deploy: the compiled JSON bytes, revalidated by ETag
+    selected = FRAMEWORKS.get(version or framework.version)
+    if selected is None:
+        raise HTTPException(status_code=404, detail="Unknown framework version")
+    etag = make_etag("framework", selected.version, selected.digest)
+    if etag_matches(request, etag):
+        response = Response(status_code=304)
+    else:
+        response = Response(content=selected.body, media_type="application/json")
+    set_public_cache_headers(response, etag)
+    return response
+
+@app.get("/api/hello")
+async def read_root():
+    return {"message": "Backend online"}
+
+
+@app.get("/api/me", response_model=MeOut)
+async def get_me(
+    request: Request,
+    response: Response,
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Names are not in the token, they come from the profile cache
+    profile = await user_cache.get(current_user.id)
+    if profile is None:
+        user = await db.get(DBUser, current_user.id)
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        profile = await user_cache.set(user)
+    me = MeOut(email=profile.email, first_name=profile.first_name, last_name=profile.last_name, role=profile.role)
+
+    etag = make_etag("me", hashlib.blake2s(me.model_dump_json().encode(), digest_size=8).hexdigest())
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_cache_headers(response, etag)
+    return me
+
+@app.post("/api/change-password")
+async def change_password(
+    request: PasswordChangeRequest, 
+    current_user: CachedUser = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_db)
+):
+    await limit_account("/api/change-password", current_user.id)
+    # The cached identity has no password hash, so load the row itself
+    user = await db.get(DBUser, current_user.id)
+
+    # 1. Verify the current password is correct using your helper
+    if not await verify_password(request.current_password, user.hashed_password):
+        raise HTTPException(status_code=400, detail="Current password incorrect")
+    
+    # 2. Hash and update with the new password using your helper
+    user.hashed_password = await get_password_hash(request.new_password)
+    # Signs out every other session; this one carries on with the fresh token
+    bump_token_version(user)
+    await db.commit()
+    await publish_token_versions({user.id: user.token_version})
+    
+    return {
+        "message": "Password updated successfully",
+        "access_token": create_access_token(data=token_claims(user)),
+        "token_type": "bearer",
+    }
+
+USER_SORT_COLUMNS = {
+    "id": DBUser.id,
+    "email": DBUser.email,
+    "first_name": DBUser.first_name,
+    "last_name": DBUser.last_name,
+}
+
+def encode_cursor(values: list):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        last_value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return last_value, int(last_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def istartswith_indexed(db: AsyncSession, column, prefix: str):
+    """Case-insensitive prefix match that the ix_users_*_lower indexes can serve."""
+    lowered = func.lower(column, type_=String)
+    if db.bind.dialect.name == "postgresql":
+        # LIKE only becomes an index range for a pattern known at planning time, so the
+        # pattern is inlined: a bound parameter gets a generic, sequential-scan plan
+        escaped = prefix.replace("/", "//").replace("%", "/%").replace("_", "/_")
+        pattern = func.lower(literal(escaped + "%", literal_execute=True), type_=String)
+        return lowered.like(pattern, escape="/")
+    # SQLite never uses an index for LIKE on an expression, but it does for a range
+    lowered_prefix = func.lower(prefix, type_=String)
+    return and_(lowered >= lowered_prefix, lowered < lowered_prefix + "\U0010ffff")
+
+@app.get("/api/admin/users", response_model=UserPageOut)
+async def get_all_users(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    sort: str = Query("id", pattern="^-?(id|email|first_name|last_name)$"),
+    role: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    name: Optional[str] = Query(None, description="First or last name prefix"),
+    email: Optional[str] = Query(None, description="Email prefix"),
+    group_id: Optional[int] = Query(None, description="Only members of this group"),
+    current_user: CachedUser = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_db)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    descending = sort.startswith("-")
+    sort_column = USER_SORT_COLUMNS[sort.lstrip("-")]
+
+    # Counts are correlated subqueries, so they only run for the rows on this page;
+    # archived assessments are counted through their monthly aggregates
+    def archived_count(kind: str):
+        return select(func.coalesce(func.sum(DBAssessmentAggregate.assessment_count), 0))\
+            .where(DBAssessmentAggregate.user_id == DBUser.id, DBAssessmentAggregate.kind == kind).scalar_subquery()
+    detailed_count = select(func.count(DBDetailedAssessment.id))\
+        .where(DBDetailedAssessment.user_id == DBUser.id).scalar_subquery() + archived_count("detailed")
+    expert_count = select(func.count(DBExpertAssessment.id))\
+        .where(DBExpertAssessment.user_id == DBUser.id).scalar_subquery() + archived_count("expert")
+
+    # Projection only: no ORM entities are built for the list
+    query = select(
+        DBUser.id, DBUser.first_name, DBUser.last_name, DBUser.email, DBUser.role, DBUser.is_active,
+        detailed_count.label("detailed_count"), expert_count.label("expert_count"),
+    )
+    if role:
+        query = query.where(DBUser.role == role)
+    if is_active is not None:
+        query = query.where(DBUser.is_active == is_active)
+    if name:
+        query = query.where(or_(
+            istartswith_indexed(db, DBUser.first_name, name),
+            istartswith_indexed(db, DBUser.last_name, name),
+        ))
+    if email:
+        query = query.where(istartswith_indexed(db, DBUser.email, email))
+    if group_id is not None:
+        query = query.where(DBUser.id.in_(group_member_ids(group_id)))
+
+    # Keyset pagination on (sort column, id): every page is an index range scan
+    if cursor:
+        last_value, last_id = decode_cursor(cursor)
+        if descending:
+            query = query.where(or_(sort_column < last_value, and_(sort_column == last_value, DBUser.id < last_id)))
+        else:
+            query = query.where(or_(sort_column > last_value, and_(sort_column == last_value, DBUser.id > last_id)))
+    if descending:
+        query = query.order_by(sort_column.desc(), DBUser.id.desc())
+    else:
+        query = query.order_by(sort_column.asc(), DBUser.id.asc())
+
+    rows = (await db.execute(query.limit(limit + 1))).mappings().all()
+
+    items = [
+        {**row, "assessment_count": row["detailed_count"] + row["expert_count"]}
+        for row in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor([last[sort_column.key], last["id"]])
+    return {"items": items, "next_cursor": next_cursor}
+
+@app.get("/api/admin/cache-stats")
+async def get_cache_stats(current_user: CachedUser = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return {"user_cache": user_cache.stats()}
+
+@app.patch("/api/admin/users/{user_id}/toggle-active")
+async def toggle_user_active(
+    user_id: int, 
+    current_user: CachedUser = Depends(get_current_user), 
+    db: AsyncSession = Depends(get_db)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    target_user = await db.get(DBUser, user_id)
+    if not target_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    target_user.is_active = not target_user.is_active
+    bump_token_version(target_user)
+    await db.commit()
+    await publish_token_versions({target_user.id: target_user.token_version})
+    await invalidate_analytics()
+    return {"is_active": target_user.is_active}
+
+@app.delete("/api/admin/users/{user_id}")
+async def delete_user(
+    user_id: int, 
+    db: AsyncSession = Depends(get_db), 
+    current_user: CachedUser = Depends(get_current_user)
+):
+    # 1. Security Check: Only admins can delete users
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    # 2. Find the user
+    user_to_delete = await db.get(DBUser, user_id)
+    if not user_to_delete:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    # 3. Prevent self-deletion
+    if user_to_delete.id == current_user.id:
+        raise HTTPException(status_code=400, detail="Cannot delete your own admin account")
+
+    # 4. Delete the user with all their assessments, summaries and memberships
+    # This ensures no "orphaned" rows remain in the database
+    revoked = await delete_users(db, DBUser.id == user_id)
+    await db.commit()
+    await publish_token_versions(revoked)
+    await invalidate_analytics()
+    
+    return {"message": f"User {user_to_delete.email} and all their data have been deleted."}
+
+@app.post("/api/admin/users/batch")
+async def batch_user_action(
+    data: BatchUserAction,
+    db: AsyncSession = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if not data.user_ids and data.group_id is None:
+        raise HTTPException(status_code=422, detail="Give user_ids, a group_id or both")
+    if data.group_id is not None and not await db.get(DBGroup, data.group_id):
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    # Admins never lock themselves out through a batch
+    condition = selected_users(data.user_ids, data.group_id, exclude_id=current_user.id)
+    if data.action == "delete":
+        versions = await delete_users(db, condition)
+    else:
+        versions = await set_users_active(db, condition, data.action == "activate")
+    await db.commit()
+    await publish_token_versions(versions)
+    await invalidate_analytics()
+
+    return {"action": data.action, "affected": len(versions), "user_ids": sorted(versions)}
+
+@app.get("/api/admin/groups", response_model=List[GroupOut])
+async def list_groups(current_user: CachedUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    member_count = func.count(DBGroupMember.user_id).label("member_count")
+    query = select(DBGroup.id, DBGroup.name, DBGroup.created_at, member_count)\
+        .outerjoin(DBGroupMember, DBGroupMember.group_id == DBGroup.id)\
+        .group_by(DBGroup.id, DBGroup.name, DBGroup.created_at)\
+        .order_by(DBGroup.name)
+    return (await db.execute(query)).mappings().all()
+
+@app.post("/api/admin/groups", response_model=GroupOut)
+async def create_group(
+    data: GroupCreate,
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if await db.scalar(select(DBGroup.id).where(DBGroup.name == data.name)):
+        raise HTTPException(status_code=400, detail="Group name already taken")
+    group = DBGroup(name=data.name)
+    db.add(group)
+    await db.commit()
+    return {"id": group.id, "name": group.name, "created_at": group.created_at, "member_count": 0}
+
+@app.delete("/api/admin/groups/{group_id}")
+async def delete_group(
+    group_id: int,
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Removes the group only; its members keep their accounts
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    group = await db.get(DBGroup, group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+    await db.execute(delete(DBGroupMember).where(DBGroupMember.group_id == group_id))
+    await db.delete(group)
+    await db.commit()
+    await invalidate_analytics()
+    return {"message": f"Group {group.name} has been deleted."}
+
+@app.post("/api/admin/groups/{group_id}/members")
+async def add_group_members(
+    group_id: int,
+    data: GroupMembersIn,
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if not await db.get(DBGroup, group_id):
+        raise HTTPException(status_code=404, detail="Group not found")
+    # INSERT ... SELECT skips unknown ids, ON CONFLICT skips existing members
+    existing_users = select(literal(group_id), DBUser.id).where(DBUser.id.in_(data.user_ids))
+    statement = dialect_insert(db, DBGroupMember).from_select(["group_id", "user_id"], existing_users)
+    result = await db.execute(statement.on_conflict_do_nothing(index_elements=["group_id", "user_id"]))
+    await db.commit()
+    await invalidate_analytics()
+    return {"added": result.rowcount}
+
+@app.post("/api/admin/groups/{group_id}/members/remove")
+async def remove_group_members(
+    group_id: int,
+    data: GroupMembersIn,
+    current_user: CachedUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    result = await db.execute(
+        delete(DBGroupMember).where(DBGroupMember.group_id == group_id, DBGroupMember.user_id.in_(data.user_ids))
+    )
+    await db.commit()
+    await invalidate_analytics()
+    return {"removed": result.rowcount}
+
+@app.post("/api/assessments/detailed")
+async def submit_detailed_assessment(
+    data: AssessmentSubmit, 
+    db: AsyncSession = Depends(get_db), 
+    current_user: CachedUser = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+):
+    # A retry of a submit that already went through gets the first response back
+    async with idempotency_keys.claim(current_user.id, idempotency_key, data.model_dump()) as claim:
+        if claim.replay is not None:
+            return claim.replay
+
+        # Create the new record
+        new_result = DBDetailedAssessment(
+            user_id=current_user.id,
+            # This double asterisk (**) unpacks the dictionary 
+            # so 'creativity' in the JSON goes to the 'creativity' column
+            **data.dict() 
+        )
+        
+        try:
+            db.add(new_result)
+            await db.flush()
+            await set_latest_pointer(db, current_user.id, latest_detailed_id=new_result.id)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
+
+        response = await claim.store({"message": "EntreComp assessment saved", "id": new_result.id})
+    await after_assessment_saved(current_user.id, "detailed", new_result.id)
+    return response
+    
+@app.get("/api/assessments/latest", response_model=Union[DetailedAssessmentOut, NoAssessmentOut])
+async def get_latest_assessment(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db), 
+    current_user: CachedUser = Depends(get_current_user)
+):
+    # Revalidation: compare against the pointer alone, the row is only read on a change
+    if request.headers.get("if-none-match"):
+        latest_id = await latest_pointer(db, current_user.id, DBUserSummary.latest_detailed_id)
+        if latest_id is not None and etag_matches(request, make_etag("detailed", latest_id)):
+            return not_modified(make_etag("detailed", latest_id))
+
+    # Fetch the most recent detailed assessment for this user through the summary pointer
+    result = await db.scalar(
+        select(DBDetailedAssessment)
+        .join(DBUserSummary, DBUserSummary.latest_detailed_id == DBDetailedAssessment.id)
+        .where(DBUserSummary.user_id == current_user.id)
+    )
+        
+    if not result:
+        return NoAssessmentOut(message="No assessments found")
+
+    set_cache_headers(response, make_etag("detailed", result.id))
+    return DetailedAssessmentOut.model_validate(result)
+
+@app.get("/api/admin/users/{user_id}/latest", response_model=Union[AdminDetailedAssessmentOut, AdminNoAssessmentOut])
+async def get_user_latest_assessment_admin(
+    user_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    target_user = await db.get(DBUser, user_id)
+    if not target_user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    result = await db.scalar(
+        select(DBDetailedAssessment)
+        .join(DBUserSummary, DBUserSummary.latest_detailed_id == DBDetailedAssessment.id)
+        .where(DBUserSummary.user_id == user_id)
+    )
+        
+    if not result:
+        # Return a specific structure so the frontend knows there's no data
+        return AdminNoAssessmentOut(message="No assessments found")
+
+    return AdminDetailedAssessmentOut(
+        **DetailedAssessmentOut.model_validate(result).model_dump(),
+        user_name=f"{target_user.first_name} {target_user.last_name}",
+    )
+
+@app.get("/api/admin/users/{user_id}/assessments")
+async def get_user_assessment_history(
+    user_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    target_user = await db.get(DBUser, user_id)
+
+    # The database computes the avg score for the summary list, we only fetch 3 columns per row
+    score_columns = [getattr(DBDetailedAssessment, comp) for comp in scoring_engine.competences]
+    avg_score = (sum(score_columns[1:], score_columns[0]) / float(len(score_columns))).label("avg_score")
+    records = await db.execute(
+        select(DBDetailedAssessment.id, DBDetailedAssessment.created_at, avg_score)
+        .where(DBDetailedAssessment.user_id == user_id)
+        .order_by(DBDetailedAssessment.created_at.desc())
+    )
+    history = [dict(r) for r in records.mappings()]
+    # Months moved out by the retention job, newest first
+    archived = await db.scalars(
+        select(DBAssessmentAggregate)
+        .where(DBAssessmentAggregate.user_id == user_id, DBAssessmentAggregate.kind == "detailed")
+        .order_by(DBAssessmentAggregate.period.desc())
+    )
+
+    return {
+        "user_name": f"{target_user.first_name} {target_user.last_name}",
+        "assessments": history,
+        "archived": [
+            {
+                "period": aggregate.period,
+                "assessment_count": aggregate.assessment_count,
+                "avg_score": sum(aggregate.means.values()) / len(aggregate.means),
+            }
+            for aggregate in archived
+        ],
+    }
+
+@app.get("/api/assessments/progress", response_model=UserProgressOut)
+async def get_my_progress(
+    db: AsyncSession = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    return await load_progress(db, current_user.id)
+
+@app.get("/api/admin/users/{user_id}/progress", response_model=UserProgressOut)
+async def get_user_progress(
+    user_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return await load_progress(db, user_id)
+
+@app.get("/api/assessments/compare", response_model=ComparisonOut)
+async def get_my_comparison(
+    db: AsyncSession = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    return await compare_with_cohort(db, current_user.id)
+
+@app.get("/api/admin/users/{user_id}/compare", response_model=ComparisonOut)
+async def get_user_comparison(
+    user_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return await compare_with_cohort(db, user_id)
+
+@app.post("/api/assessments/expert")
+async def submit_expert_assessment(
+    scores: dict, 
+    db: AsyncSession = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+):
+    # 1. Calculate the 15 Competence Averages (rejects unknown thread IDs)
+    try:
+        scores = scoring_engine.canonical(scores)
+        calculated_results = scoring_engine.score(scores)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # A retry of a submit that already went through gets the first response back
+    async with idempotency_keys.claim(current_user.id, idempotency_key, scores) as claim:
+        if claim.replay is not None:
+            return claim.replay
+
+        try:
+            # 2. Create the Instance; the engine returns exactly the 15 competence columns
+            new_assessment = DBExpertAssessment(
+                user_id=current_user.id,
+                thread_scores=scores,  # Packed to one byte per thread by PackedThreadScores
+                **calculated_results
+            )
+            
+            # 3. Save and Commit
+            db.add(new_assessment)
+            logger.debug(
+                "Saving expert assessment",
+                extra={"user_id": current_user.id, "thread_scores": scores, "results": calculated_results},
+            )
+            await db.flush()  # Assigns the new ID
+            await set_latest_pointer(db, current_user.id, latest_expert_id=new_assessment.id)
+            await db.commit()
+
+        except Exception as e:
+            await db.rollback() # Rollback if there is a DB error
+            logger.exception("Error saving expert assessment", extra={"user_id": current_user.id})
+            raise HTTPException(status_code=500, detail=str(e))
+
+        response = await claim.store({
+            "status": "success",
+            "assessment_id": new_assessment.id,
+            "results": calculated_results
+        })
+    await after_assessment_saved(current_user.id, "expert", new_assessment.id)
+    return response
+    
+
+@app.get("/api/assessments/expert/latest", response_model=ExpertAssessmentOut)
+async def get_latest_expert_assessment(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    if request.headers.get("if-none-match"):
+        latest_id = await latest_pointer(db, current_user.id, DBUserSummary.latest_expert_id)
+        if latest_id is not None and etag_matches(request, make_etag("expert", latest_id)):
+            return not_modified(make_etag("expert", latest_id))
+
+    assessment = await db.scalar(
+        select(DBExpertAssessment)
+        .join(DBUserSummary, DBUserSummary.latest_expert_id == DBExpertAssessment.id)
+        .where(DBUserSummary.user_id == current_user.id)
+    )
+    
+    if not assessment:
+        raise HTTPException(status_code=404, detail="No assessment found")
+
+    set_cache_headers(response, make_etag("expert", assessment.id))
+    return ExpertAssessmentOut.model_validate(assessment)
+
+@app.post("/api/assessments/expert/bulk")
+async def bulk_submit_expert_assessments(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    parsed = await read_bulk_records(request)
+    by_email, known_ids = await resolve_owners(db, [record for record, _ in parsed])
+    now = datetime.now(timezone.utc)
+
+    # 1. Validate every row, keeping per-row errors instead of failing the batch
+    results, valid_scores, valid_meta = [], [], []
+    for row_number, (record, error) in enumerate(parsed):
+        results.append({"row": row_number, "status": "error", "detail": error})
+        if error:
+            continue
+        try:
+            owner = owner_and_timestamp(record, by_email, known_ids, now)
+            # Nested {"thread_scores": {...}} or flat thread columns (CSV)
+            scores = record.get("thread_scores")
+            if scores is None:
+                scores = {k: v for k, v in record.items() if k not in OWNER_FIELDS}
+            if not isinstance(scores, dict):
+                raise ValueError("thread_scores must be an object")
+            scores = scoring_engine.canonical(scores)
+            scoring_engine.validate(scores)
+        except ValueError as e:
+            results[row_number]["detail"] = str(e)
+            continue
+        valid_scores.append(scores)
+        valid_meta.append((row_number, owner))
+
+    # 2. Score all valid rows in one matrix pass
+    competence_scores, _ = scoring_engine.score_batch(valid_scores, validate=False)
+    rows = [
+        {"user_id": user_id, "created_at": created_at, "thread_scores": scores, **scoring_engine.results(comp_row)}
+        for (_, (user_id, created_at)), scores, comp_row in zip(valid_meta, valid_scores, competence_scores)
+    ]
+
+    # 3. Insert in chunks inside one transaction
+    return await store_bulk_rows(
+        db, DBExpertAssessment, "latest_expert_id", results, rows, [n for n, _ in valid_meta]
+    )
+
+@app.post("/api/assessments/detailed/bulk")
+async def bulk_submit_detailed_assessments(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+    parsed = await read_bulk_records(request)
+    by_email, known_ids = await resolve_owners(db, [record for record, _ in parsed])
+    now = datetime.now(timezone.utc)
+
+    results, rows, row_numbers = [], [], []
+    for row_number, (record, error) in enumerate(parsed):
+        results.append({"row": row_number, "status": "error", "detail": error})
+        if error:
+            continue
+        try:
+            user_id, created_at = owner_and_timestamp(record, by_email, known_ids, now)
+            data = AssessmentSubmit.model_validate(record)
+        except ValueError as e:
+            # pydantic's ValidationError is a ValueError too
+            results[row_number]["detail"] = validation_message(e) if isinstance(e, ValidationError) else str(e)
+            continue
+        rows.append({"user_id": user_id, "created_at": created_at, **data.model_dump()})
+        row_numbers.append(row_number)
+
+    return await store_bulk_rows(db, DBDetailedAssessment, "latest_detailed_id", results, rows, row_numbers)
+
+@app.get("/api/admin/exports/assessments")
+async def export_assessments(
+    kind: str = Query("expert", pattern="^(detailed|expert)$"),
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    user_id: Optional[int] = None,
+    group_id: Optional[int] = Query(None, description="Only members of this group"),
+    competence: List[str] = Query([], description="Only export these competence columns"),
+    flatten_threads: bool = Query(False, description="Expert only: one column per thread"),
+    include_archived: bool = Query(False, description="Also rows moved to the archive by retention"),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if format == "parquet" and not load_pyarrow():
+        raise HTTPException(status_code=400, detail="Parquet export needs pyarrow installed on the server")
+    unknown = set(competence) - set(scoring_engine.competences)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown competences: {', '.join(sorted(unknown))}")
+
+    columns = ["id", "user_id", "created_at"] + (competence or scoring_engine.competences)
+    if kind == "expert":
+        columns.append("thread_scores")
+    flatten_threads = flatten_threads and kind == "expert"
+
+    def filtered(table):
+        query = select(*(table.c[name] for name in columns))
+        if date_from:
+            query = query.where(table.c.created_at >= date_from)
+        if date_to:
+            query = query.where(table.c.created_at < date_to)
+        if user_id is not None:
+            query = query.where(table.c.user_id == user_id)
+        if group_id is not None:
+            query = query.where(table.c.user_id.in_(group_member_ids(group_id)))
+        return query
+
+    query = filtered(EXPORT_MODELS[kind].__table__)
+    if include_archived:
+        # Archived rows keep their ids, so one id order interleaves both tables
+        rows = union_all(query, filtered(ARCHIVE_TABLES[kind])).subquery()
+        query = select(rows).order_by(rows.c.id)
+    else:
+        query = query.order_by(EXPORT_MODELS[kind].id)
+
+    if flatten_threads:
+        columns = columns[:-1] + scoring_engine.thread_ids
+
+    return StreamingResponse(
+        encode_export(query, kind, format, columns, flatten_threads),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{kind}_assessments.{format}"'},
+    )
+
+@app.get("/api/admin/analytics")
+async def get_cohort_analytics(
+    kind: List[str] = Query(["expert", "detailed"]),
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    is_active: Optional[bool] = None,
+    role: Optional[str] = None,
+    group_id: Optional[int] = Query(None, description="Only members of this group"),
+    db: AsyncSession = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    unknown = set(kind) - set(ANALYTICS_MODELS)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown kinds: {', '.join(sorted(unknown))}")
+
+    return await cohort_analytics(db, kind, date_from, date_to, is_active, role, group_id)
+
+@app.post("/api/admin/retention")
+async def run_retention(
+    dry_run: bool = Query(True, description="Only report what would be archived"),
+    days: int = Query(RETENTION_DAYS, ge=1),
+    db: AsyncSession = Depends(get_db),
+    current_user: CachedUser = Depends(get_current_user)
+):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if dry_run:
+        return await apply_retention(db, days, dry_run=True)
+    # The real run can take a while: it goes to the job queue, one at a time
+    if not await job_queue.enqueue("retention", {"days": days}, key="retention"):
+        raise HTTPException(status_code=503, detail="Job queue is full, try again later")
+    return JSONResponse(status_code=202, content={"queued": True, "days": days})
@@ -0,0 +1,70 @@
+"""Baseline: the schema Base.metadata.create_all used to build at import
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+COMPETENCES = [
+    "spotting_opportunities", "creativity", "vision", "valuing_ideas", "ethical_thinking",
+    "self_awareness", "motivation", "mobilising_resources", "financial_literacy", "mobilising_others",
+    "taking_initiative", "planning_management", "coping_with_ambiguity", "working_with_others",
+    "learning_through_experience",
+]
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String()),
+        sa.Column("first_name", sa.String()),
+        sa.Column("last_name", sa.String()),
+        sa.Column("hashed_password", sa.String()),
+        sa.Column("role", sa.String()),
+        sa.Column("is_active", sa.Boolean()),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "assessments",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("score", sa.Float()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+    )
+    op.create_index("ix_assessments_id", "assessments", ["id"])
+
+    op.create_table(
+        "detailed_assessments",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        *[sa.Column(name, sa.Integer()) for name in COMPETENCES],
+    )
+    op.create_index("ix_detailed_assessments_id", "detailed_assessments", ["id"])
+
+    op.create_table(
+        "expert_assessments",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("thread_scores", sa.JSON()),
+        *[sa.Column(name, sa.Float()) for name in COMPETENCES],
+    )
+    op.create_index("ix_expert_assessments_id", "expert_assessments", ["id"])
+
+
+def downgrade():
+    op.drop_table("expert_assessments")
+    op.drop_table("detailed_assessments")
+    op.drop_table("assessments")
+    op.drop_table("users")
@@ -0,0 +1,61 @@
+"""Per-user latest-assessment pointers and the indexes behind the hot reads
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Admin user list: keyset sorting and filters
+    op.create_index("ix_users_last_name_id", "users", ["last_name", "id"])
+    op.create_index("ix_users_first_name_id", "users", ["first_name", "id"])
+    op.create_index("ix_users_role_is_active", "users", ["role", "is_active"])
+    # Case-insensitive prefix filters on lower(column); text_pattern_ops for LIKE 'abc%' on Postgres
+    for column in ("first_name", "last_name", "email"):
+        op.create_index(
+            f"ix_users_{column}_lower", "users", [sa.func.lower(sa.column(column)).label(f"{column}_lower")],
+            postgresql_ops={f"{column}_lower": "text_pattern_ops"},
+        )
+
+    # Newest-first history per user
+    for table in ("assessments", "detailed_assessments", "expert_assessments"):
+        op.create_index(
+            f"ix_{table}_user_id_created_at", table, ["user_id", sa.text("created_at DESC")]
+        )
+
+    op.create_table(
+        "user_summaries",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("latest_detailed_id", sa.Integer(), sa.ForeignKey("detailed_assessments.id", ondelete="SET NULL")),
+        sa.Column("latest_expert_id", sa.Integer(), sa.ForeignKey("expert_assessments.id", ondelete="SET NULL")),
+    )
+
+    # Backfill from existing history (uses the indexes created above)
+    op.execute("""
+        INSERT INTO user_summaries (user_id, latest_detailed_id, latest_expert_id)
+        SELECT u.id,
+            (SELECT d.id FROM detailed_assessments d WHERE d.user_id = u.id
+             ORDER BY d.created_at DESC, d.id DESC LIMIT 1),
+            (SELECT e.id FROM expert_assessments e WHERE e.user_id = u.id
+             ORDER BY e.created_at DESC, e.id DESC LIMIT 1)
+        FROM users u
+    """)
+
+
+def downgrade():
+    op.drop_table("user_summaries")
+    for table in ("assessments", "detailed_assessments", "expert_assessments"):
+        op.drop_index(f"ix_{table}_user_id_created_at", table_name=table)
+    for column in ("first_name", "last_name", "email"):
+        op.drop_index(f"ix_users_{column}_lower", table_name="users")
+    op.drop_index("ix_users_role_is_active", table_name="users")
+    op.drop_index("ix_users_first_name_id", table_name="users")
+    op.drop_index("ix_users_last_name_id", table_name="users")
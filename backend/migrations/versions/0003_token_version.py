@@ -0,0 +1,33 @@
+"""Token version per user, checked against the "ver" claim of every token
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(sa.Column("token_version", sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade():
+    # The SQLite table rebuild can't reflect the lower(column) indexes of 0002, so they
+    # are dropped beforehand and created again on the rebuilt table
+    lower_columns = ("first_name", "last_name", "email")
+    for column in lower_columns:
+        op.drop_index(f"ix_users_{column}_lower", table_name="users")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("token_version")
+    for column in lower_columns:
+        op.create_index(
+            f"ix_users_{column}_lower", "users", [sa.func.lower(sa.column(column)).label(f"{column}_lower")],
+            postgresql_ops={f"{column}_lower": "text_pattern_ops"},
+        )
@@ -0,0 +1,37 @@
+"""Per-user progress summaries (running means, deltas, trend)
+
+Rows are created on the next submit, or on the first progress read for users
+with older history, so there is no backfill here.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "user_progress",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("kind", sa.String(), primary_key=True),
+        sa.Column("assessment_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("latest_id", sa.Integer()),
+        sa.Column("latest_at", sa.DateTime(timezone=True)),
+        sa.Column("means", sa.JSON()),
+        sa.Column("latest_scores", sa.JSON()),
+        sa.Column("deltas", sa.JSON()),
+        sa.Column("best_area", sa.String()),
+        sa.Column("worst_area", sa.String()),
+        sa.Column("trend", sa.JSON()),
+    )
+
+
+def downgrade():
+    op.drop_table("user_progress")
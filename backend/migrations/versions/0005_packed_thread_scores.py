@@ -0,0 +1,101 @@
+"""Store expert thread scores packed (version byte + one byte per thread)
+
+Converts the JSON column in place, batch by batch. The version 1 thread order
+is copied here on purpose: it must not follow later edits of EXPERT_MAPPING.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+import json
+import math
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+BATCH = 5000
+LAYOUT_V1 = (
+    "so_seize", "so_challenges", "so_needs", "so_analyse",
+    "cr_curious", "cr_develop", "cr_problems", "cr_value", "cr_innovative",
+    "vi_imagine", "vi_think", "vi_action", "vi_value", "vi_protect",
+    "et_ethically", "et_sustainably", "et_impact", "et_accountable",
+    "sa_aspirations", "sa_sw", "sa_ability", "sa_future",
+    "mp_driven", "mp_determined", "mp_focus", "mp_resilient", "mp_giveup",
+    "mr_manage", "mr_responsibly", "mr_make", "mr_support",
+    "fel_understand", "fel_budget", "fel_funding", "fel_taxation",
+    "mo_inspire", "mo_persuade", "mo_communicate", "mo_media",
+    "ti_responsibility", "ti_independently", "ti_action",
+    "pm_goals", "pm_plan", "pm_develop", "pm_priorities", "pm_monitor", "pm_flexible",
+    "co_co", "co_calculate", "co_manage",
+    "wo_accept", "wo_develop", "wo_listen", "wo_team", "wo_together", "wo_expand",
+    "le_reflect", "le_learn", "le_experience",
+)
+# Stored by frontend builds from before the thread id was fixed
+LEGACY_IDS = {"pm_ priorities": "pm_priorities"}
+
+
+def pack(scores: dict, row_id: int):
+    renamed = {}
+    for tid, value in scores.items():
+        tid = LEGACY_IDS.get(tid, tid)
+        if tid in renamed:
+            raise ValueError(f"expert_assessments.id={row_id}: two scores for {tid}")
+        renamed[tid] = value
+    # Dropping a score here would lose it for good
+    unknown = renamed.keys() - set(LAYOUT_V1)
+    if unknown:
+        raise ValueError(f"expert_assessments.id={row_id}: unknown thread IDs {', '.join(sorted(unknown))}")
+    values = []
+    for tid in LAYOUT_V1:
+        value = renamed.get(tid)
+        if value is not None and (
+            not isinstance(value, (int, float)) or not math.isfinite(value)
+            or value != int(value) or not 1 <= value <= 255
+        ):
+            raise ValueError(f"expert_assessments.id={row_id}: {tid}={value!r} cannot be packed")
+        values.append(0 if value is None else int(value))
+    return bytes([1, *values])
+
+
+def unpack(packed: bytes):
+    return {tid: value for tid, value in zip(LAYOUT_V1, packed[1:]) if value}
+
+
+def convert(source: str, target: str, transform):
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(sa.text(
+            f"SELECT id, {source} FROM expert_assessments WHERE id > :last_id ORDER BY id LIMIT {BATCH}"
+        ), {"last_id": last_id}).fetchall()
+        if not rows:
+            break
+        updates = [{"id": row_id, "value": transform(value, row_id)} for row_id, value in rows if value is not None]
+        if updates:
+            conn.execute(sa.text(f"UPDATE expert_assessments SET {target} = :value WHERE id = :id"), updates)
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    op.add_column("expert_assessments", sa.Column("thread_scores_packed", sa.LargeBinary()))
+    # JSON comes back as text from some drivers and as a dict from others
+    convert(
+        "thread_scores", "thread_scores_packed",
+        lambda value, row_id: pack(json.loads(value) if isinstance(value, str) else value, row_id),
+    )
+    with op.batch_alter_table("expert_assessments") as batch:
+        batch.drop_column("thread_scores")
+        batch.alter_column("thread_scores_packed", new_column_name="thread_scores")
+
+
+def downgrade():
+    op.add_column("expert_assessments", sa.Column("thread_scores_json", sa.JSON()))
+    convert("thread_scores", "thread_scores_json", lambda value, row_id: json.dumps(unpack(bytes(value))))
+    with op.batch_alter_table("expert_assessments") as batch:
+        batch.drop_column("thread_scores")
+        batch.alter_column("thread_scores_json", new_column_name="thread_scores")
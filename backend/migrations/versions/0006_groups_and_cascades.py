@@ -0,0 +1,60 @@
+"""User groups, and ON DELETE CASCADE from every assessment table to users
+
+The baseline created the assessment foreign keys without a name. Postgres
+called them <table>_user_id_fkey; on SQLite batch mode names the reflected
+constraint through the naming convention below so it can be dropped.
+The SQLite rebuild also loses the DESC of the history indexes (0005 already
+lost it on expert_assessments), so they are recreated afterwards.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+ASSESSMENT_TABLES = ("assessments", "detailed_assessments", "expert_assessments")
+NAMING_CONVENTION = {"fk": "%(table_name)s_%(column_0_name)s_fkey"}
+
+
+def replace_user_fk(table: str, ondelete):
+    name = f"{table}_user_id_fkey"
+    with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch:
+        batch.drop_constraint(name, type_="foreignkey")
+        batch.create_foreign_key(name, "users", ["user_id"], ["id"], ondelete=ondelete)
+    if op.get_bind().dialect.name == "sqlite":
+        index = f"ix_{table}_user_id_created_at"
+        op.drop_index(index, table_name=table)
+        op.create_index(index, table, ["user_id", sa.text("created_at DESC")])
+
+
+def upgrade():
+    op.create_table(
+        "groups",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False, unique=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_groups_id", "groups", ["id"])
+    op.create_table(
+        "group_members",
+        sa.Column("group_id", sa.Integer(), sa.ForeignKey("groups.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+    )
+    op.create_index("ix_group_members_user_id", "group_members", ["user_id"])
+    for table in ASSESSMENT_TABLES:
+        replace_user_fk(table, "CASCADE")
+
+
+def downgrade():
+    for table in ASSESSMENT_TABLES:
+        replace_user_fk(table, None)
+    op.drop_index("ix_group_members_user_id", table_name="group_members")
+    op.drop_table("group_members")
+    op.drop_index("ix_groups_id", table_name="groups")
+    op.drop_table("groups")
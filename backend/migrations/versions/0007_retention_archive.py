@@ -0,0 +1,62 @@
+"""Retention: monthly assessment aggregates and the *_archive tables
+
+The archive tables copy the columns of their hot table (no foreign keys, the
+rows are moved there verbatim) plus archived_at.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+COMPETENCES = (
+    "spotting_opportunities", "creativity", "vision", "valuing_ideas", "ethical_thinking",
+    "self_awareness", "motivation", "mobilising_resources", "financial_literacy", "mobilising_others",
+    "taking_initiative", "planning_management", "coping_with_ambiguity", "working_with_others",
+    "learning_through_experience",
+)
+
+
+def create_archive(name: str, *columns):
+    op.create_table(
+        f"{name}_archive",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("user_id", sa.Integer()),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+        *columns,
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index(f"ix_{name}_archive_user_id_created_at", f"{name}_archive", ["user_id", "created_at"])
+
+
+def upgrade():
+    op.create_table(
+        "assessment_aggregates",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("kind", sa.String(), primary_key=True),
+        sa.Column("period", sa.String(), primary_key=True),
+        sa.Column("assessment_count", sa.Integer(), nullable=False),
+        sa.Column("first_at", sa.DateTime(timezone=True)),
+        sa.Column("last_at", sa.DateTime(timezone=True)),
+        sa.Column("means", sa.JSON()),
+    )
+    create_archive("assessments", sa.Column("score", sa.Float()))
+    create_archive("detailed_assessments", *(sa.Column(name, sa.Integer()) for name in COMPETENCES))
+    create_archive(
+        "expert_assessments",
+        sa.Column("thread_scores", sa.LargeBinary()),
+        *(sa.Column(name, sa.Float()) for name in COMPETENCES),
+    )
+
+
+def downgrade():
+    for name in ("assessments", "detailed_assessments", "expert_assessments"):
+        op.drop_index(f"ix_{name}_archive_user_id_created_at", table_name=f"{name}_archive")
+        op.drop_table(f"{name}_archive")
+    op.drop_table("assessment_aggregates")
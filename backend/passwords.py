@@ -0,0 +1,38 @@
+import bcrypt
+
+# Kept in its own module (no FastAPI / SQLAlchemy imports) so the hashing
+# process pool in main.py can import it cheaply in every worker process.
+
+
+def _password_bytes(password: str):
+    # Bcrypt strictly requires bytes, and errors past 72 bytes, so hard truncate
+    return password.encode('utf-8')[:72]
+
+
+def get_password_hash(password: str, rounds: int = 12):
+    salt = bcrypt.gensalt(rounds=rounds)
+    hashed = bcrypt.hashpw(_password_bytes(password), salt)
+    return hashed.decode('utf-8')
+
+
+def verify_password(plain_password: str, hashed_password: str):
+    # Check if plain matches hashed
+    return bcrypt.checkpw(_password_bytes(plain_password), hashed_password.encode('utf-8'))
+
+
+def hash_rounds(hashed_password: str):
+    # A bcrypt hash looks like "$2b$12$<salt+digest>", the cost is the 3rd field
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def verify_and_rehash(plain_password: str, hashed_password: str, rounds: int = 12):
+    """Returns (matches, new_hash). new_hash is only set when the password matched
+    but was stored with a different cost factor than the one configured now."""
+    if not verify_password(plain_password, hashed_password):
+        return False, None
+    if hash_rounds(hashed_password) != rounds:
+        return True, get_password_hash(plain_password, rounds)
+    return True, None
@@ -0,0 +1,30 @@
+"""Archive assessments older than the retention window, for cron or a one-off run.
+
+    python retention.py --dry-run              # report only
+    python retention.py --days 730             # roll up, archive and delete
+
+Uses the app's DATABASE_URL and the same code as POST /api/admin/retention.
+Prints the report as JSON: rows and estimated bytes per table.
+"""
+import argparse
+import asyncio
+import json
+
+from main import RETENTION_DAYS, SessionLocal, apply_retention, close_database, init_database
+
+
+async def run(args):
+    init_database()
+    try:
+        async with SessionLocal() as db:
+            report = await apply_retention(db, args.days, dry_run=args.dry_run)
+    finally:
+        await close_database()
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS, help="Archive rows older than this")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be archived")
+    asyncio.run(run(parser.parse_args()))
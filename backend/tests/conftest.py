@@ -0,0 +1,50 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# main reads its settings at import time: a throwaway SQLite database, cheap
+# hashes, and the in-process cache, bucket and job backends
+DB_PATH = os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["AUTO_CREATE_SCHEMA"] = "1"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["RATE_LIMIT_REGISTER_IP"] = "1000/60"
+for name in ("CACHE_URL", "RATE_LIMIT_URL", "JOB_QUEUE_URL"):
+    os.environ.pop(name, None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def client():
+    import main
+    from fastapi.testclient import TestClient
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def login(client, role="user"):
+    """Registers and activates a fresh user, returns its Authorization header."""
+    email = f"{uuid.uuid4().hex[:12]}@example.com"
+    response = client.post(
+        "/api/register", json={"email": email, "first_name": "Test", "last_name": "User", "password": "pw"},
+    )
+    assert response.status_code == 200, response.text
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute("UPDATE users SET is_active = 1, role = ? WHERE email = ?", (role, email))
+    token = client.post("/api/login", data={"username": email, "password": "pw"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def user_headers(client):
+    return login(client)
+
+
+@pytest.fixture
+def admin_headers(client):
+    return login(client, role="admin")
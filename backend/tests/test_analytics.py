@@ -0,0 +1,35 @@
+import asyncio
+
+import main
+from conftest import login
+
+
+def creativity(client, headers):
+    response = client.get("/api/admin/analytics", params={"kind": "detailed"}, headers=headers)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    return body["generated_at"], body["detailed"]["competences"].get("creativity", {}).get("count", 0)
+
+
+def test_cached_until_an_assessment_arrives(client, admin_headers):
+    generated_at, count = creativity(client, admin_headers)
+    assert creativity(client, admin_headers) == (generated_at, count)
+
+    scores = {comp: 5 for comp in main.scoring_engine.competences}
+    response = client.post("/api/assessments/detailed", json=scores, headers=login(client))
+    assert response.status_code == 200, response.text
+    assert creativity(client, admin_headers)[1] == count + 1
+
+
+def test_generation_orphans_older_entries():
+    cache = main.LocalTTLCache(10, 60)
+
+    async def run():
+        before = await cache.counter("generation")
+        await cache.set(f"{before}:query", {"stale": True})
+        await cache.incr("generation")
+        after = await cache.counter("generation")
+        return after, await cache.get(f"{after}:query")
+
+    after, entry = asyncio.run(run())
+    assert after == 1 and entry is None
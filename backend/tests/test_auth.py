@@ -0,0 +1,50 @@
+import asyncio
+
+from jose import jwt
+
+import main
+from conftest import login
+
+
+def test_password_change_revokes_earlier_tokens(client, user_headers):
+    assert client.get("/api/me", headers=user_headers).status_code == 200
+    response = client.post(
+        "/api/change-password", headers=user_headers,
+        json={"current_password": "pw", "new_password": "pw2", "confirm_new_password": "pw2"},
+    )
+    assert response.status_code == 200, response.text
+    assert client.get("/api/me", headers=user_headers).status_code == 401
+
+
+def test_deactivation_revokes_tokens(client, user_headers, admin_headers):
+    token = user_headers["Authorization"].removeprefix("Bearer ")
+    user_id = jwt.get_unverified_claims(token)["uid"]
+    response = client.patch(f"/api/admin/users/{user_id}/toggle-active", headers=admin_headers)
+    assert response.status_code == 200, response.text
+    assert client.get("/api/me", headers=user_headers).status_code == 401
+
+
+def test_token_ahead_of_a_stale_cache_entry_is_accepted(client, user_headers):
+    # Another worker handled the password change: this one still caches the old version
+    response = client.post(
+        "/api/change-password", headers=user_headers,
+        json={"current_password": "pw", "new_password": "pw2", "confirm_new_password": "pw2"},
+    )
+    assert response.status_code == 200, response.text
+    token = response.json()["access_token"]
+    old_claims = jwt.get_unverified_claims(user_headers["Authorization"].removeprefix("Bearer "))
+    asyncio.run(main.token_versions.set({old_claims["uid"]: old_claims["ver"]}))
+
+    assert jwt.get_unverified_claims(token)["ver"] == old_claims["ver"] + 1
+    assert client.get("/api/me", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    # Reloaded from the database, so the old token is refused again
+    assert client.get("/api/me", headers=user_headers).status_code == 401
+
+
+def test_deleted_user_stays_revoked(client, admin_headers):
+    headers = login(client)
+    user_id = jwt.get_unverified_claims(headers["Authorization"].removeprefix("Bearer "))["uid"]
+    # Someone registered later, or SQLite would hand the deleted id to the next user
+    login(client)
+    assert client.delete(f"/api/admin/users/{user_id}", headers=admin_headers).status_code == 200
+    assert client.get("/api/me", headers=headers).status_code == 401
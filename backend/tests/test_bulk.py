@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+import main
+
+
+def test_oversized_upload_is_refused_on_content_length(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(main, "BULK_MAX_BYTES", 100)
+    body = b'[{"email": "a@example.com", "thread_scores": {"so_seize": 3}}]' * 3
+    response = client.post(
+        "/api/assessments/expert/bulk", content=body,
+        headers={**admin_headers, "Content-Type": "application/json"},
+    )
+    assert response.status_code == 413
+
+
+def test_chunked_upload_stops_at_the_cap(monkeypatch):
+    monkeypatch.setattr(main, "BULK_MAX_BYTES", 100)
+    sent = []
+
+    class ChunkedRequest:
+        # No Content-Length: the body has to be counted as it arrives
+        headers = {}
+
+        async def stream(self):
+            for _ in range(1000):
+                sent.append(1)
+                yield b"x" * 40
+
+    with pytest.raises(main.HTTPException) as refused:
+        asyncio.run(main.read_bulk_body(ChunkedRequest()))
+    assert refused.value.status_code == 413
+    assert len(sent) == 3
+
+
+def test_upload_under_the_cap_is_read(client, admin_headers):
+    email = client.get("/api/me", headers=admin_headers).json()["email"]
+    body = f'{{"email": "{email}", "thread_scores": {{"so_seize": 3}}}}\n'
+    response = client.post(
+        "/api/assessments/expert/bulk", content=body,
+        headers={**admin_headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200, response.text
+    assert response.json()["created"] == 1
@@ -0,0 +1,17 @@
+import os
+
+import main
+
+
+def test_login_survives_a_killed_hash_worker(client, user_headers):
+    # Kill every worker of the pool: the executor marks itself broken
+    pool = main.get_hash_pool()
+    for process in list(pool._processes.values()):
+        os.kill(process.pid, 9)
+        process.join()
+
+    response = client.post("/api/register", json={
+        "email": "after-crash@example.com", "first_name": "A", "last_name": "B", "password": "pw",
+    })
+    assert response.status_code == 200, response.text
+    assert main.get_hash_pool() is not pool
@@ -0,0 +1,98 @@
+import asyncio
+from contextlib import AsyncExitStack
+
+import pytest
+
+import main
+
+SCORES = {comp: 4 for comp in main.scoring_engine.competences}
+
+
+def test_replay_returns_the_first_response(client, user_headers):
+    headers = {**user_headers, "Idempotency-Key": "replay"}
+    first = client.post("/api/assessments/detailed", json=SCORES, headers=headers)
+    second = client.post("/api/assessments/detailed", json=SCORES, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+
+
+def test_failed_request_releases_its_key(client, user_headers, monkeypatch):
+    headers = {**user_headers, "Idempotency-Key": "failed"}
+
+    async def broken(*args, **kwargs):
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(main, "set_latest_pointer", broken)
+    assert client.post("/api/assessments/detailed", json=SCORES, headers=headers).status_code == 500
+    monkeypatch.undo()
+    # Not a 409: the retry runs the request again
+    response = client.post("/api/assessments/detailed", json=SCORES, headers=headers)
+    assert response.status_code == 200, response.text
+    assert "Idempotent-Replayed" not in response.headers
+
+
+async def reserve(keys, user_id, key, payload):
+    # Enters the claim and never leaves it, like a request that is still running
+    return await AsyncExitStack().enter_async_context(keys.claim(user_id, key, payload))
+
+
+def test_cancelled_request_releases_its_key(monkeypatch):
+    # CancelledError is not an Exception: leaving the claim still frees the key
+    keys = main.IdempotencyKeys(main.LocalTTLCache(10, 3600))
+    monkeypatch.setattr(main, "idempotency_keys", keys)
+
+    class Session:
+        def add(self, row):
+            pass
+
+        async def commit(self):
+            raise asyncio.CancelledError
+
+    async def run():
+        user = main.CachedUser(id=1, email="a@example.com", role="user", is_active=True)
+        data = main.AssessmentCreate(score=3)
+        try:
+            await main.save_assessment(data, Session(), user, "cancelled")
+        except asyncio.CancelledError:
+            pass
+        return await reserve(keys, 1, "cancelled", data.model_dump())
+
+    claim = asyncio.run(run())
+    assert claim.replay is None
+
+
+def test_pending_claim_expires_on_its_own(monkeypatch):
+    keys = main.IdempotencyKeys(main.LocalTTLCache(10, 3600))
+    monkeypatch.setattr(main, "IDEMPOTENCY_PENDING_SECONDS", 60)
+    now = main.time.monotonic()
+
+    async def run():
+        await reserve(keys, 1, "stuck", {"a": 1})
+        with pytest.raises(main.HTTPException) as busy:
+            await reserve(keys, 1, "stuck", {"a": 1})
+        assert busy.value.status_code == 409
+        monkeypatch.setattr(main.time, "monotonic", lambda: now + 61)
+        return await reserve(keys, 1, "stuck", {"a": 1})
+
+    assert asyncio.run(run()).replay is None
+
+
+def test_entry_expiring_during_the_claim_is_claimed_again():
+    class ExpiringBackend(main.LocalTTLCache):
+        # The first add() loses to an entry that is gone by the time get() runs
+        refused = False
+
+        async def add(self, key, value, ttl_seconds=None):
+            if not self.refused:
+                self.refused = True
+                return False
+            return await super().add(key, value, ttl_seconds)
+
+    keys = main.IdempotencyKeys(ExpiringBackend(10, 3600))
+
+    async def run():
+        async with keys.claim(1, "race", {"a": 1}) as claim:
+            return claim.owned, claim.replay
+
+    assert asyncio.run(run()) == (True, None)
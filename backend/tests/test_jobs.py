@@ -0,0 +1,103 @@
+import asyncio
+import gc
+import sqlite3
+import time
+
+from jose import jwt
+
+import main
+from conftest import DB_PATH, login
+
+
+def test_delayed_job_survives_garbage_collection():
+    queue = main.JobQueue(main.LocalJobBackend(10), workers=0, max_attempts=1, retry_seconds=0)
+
+    async def run():
+        queue._push_later({"name": "noop", "payload": {}, "attempt": 1, "key": None}, 0.05)
+        gc.collect()
+        return await asyncio.wait_for(queue.backend.pop(), timeout=1)
+
+    assert asyncio.run(run())["name"] == "noop"
+
+
+def test_stop_cancels_delayed_jobs():
+    queue = main.JobQueue(main.LocalJobBackend(10), workers=1, max_attempts=1, retry_seconds=0)
+
+    async def run():
+        queue.start()
+        await queue.enqueue("noop", {}, delay=3600)
+        await queue.stop(timeout=0)
+        return len(queue._delayed)
+
+    assert asyncio.run(run()) == 0
+
+
+def progress(client, admin_headers, user_id, count):
+    # The progress job runs on the queue: wait for it to catch up
+    for _ in range(100):
+        body = client.get(f"/api/admin/users/{user_id}/progress", headers=admin_headers).json()["detailed"]
+        if body and body["assessment_count"] == count:
+            return body
+        time.sleep(0.02)
+    raise AssertionError(body)
+
+
+def test_lost_progress_job_is_repaired_by_the_next_one(client, admin_headers):
+    headers = login(client)
+    user_id = jwt.get_unverified_claims(headers["Authorization"].removeprefix("Bearer "))["uid"]
+    competences = main.scoring_engine.competences
+
+    assert client.post("/api/assessments/detailed", json=dict.fromkeys(competences, 2), headers=headers).status_code == 200
+    progress(client, admin_headers, user_id, 1)
+    # A submit whose progress job never ran
+    with sqlite3.connect(DB_PATH) as conn:
+        conn.execute(
+            f"INSERT INTO detailed_assessments (user_id, created_at, {', '.join(competences)})"
+            f" VALUES (?, CURRENT_TIMESTAMP, {', '.join('6' for _ in competences)})",
+            (user_id,),
+        )
+    assert client.post("/api/assessments/detailed", json=dict.fromkeys(competences, 4), headers=headers).status_code == 200
+
+    body = progress(client, admin_headers, user_id, 3)
+    assert body["means"]["creativity"] == 4.0
+    assert body["deltas"]["creativity"] == -2.0
+
+
+def test_coalescing_key_is_shared_between_workers(monkeypatch):
+    # Two workers on one backend: the one that runs the job frees the key of the one that queued it
+    ran = []
+
+    async def warm():
+        ran.append(1)
+
+    monkeypatch.setitem(main.JOB_HANDLERS, "warm", warm)
+    backend = main.LocalJobBackend(10)
+    enqueuing = main.JobQueue(backend, workers=0, max_attempts=1, retry_seconds=0)
+    running = main.JobQueue(backend, workers=0, max_attempts=1, retry_seconds=0)
+
+    async def run():
+        assert await enqueuing.enqueue("warm", {}, key="warm")
+        assert await enqueuing.enqueue("warm", {}, key="warm")
+        assert await running.enqueue("warm", {}, key="warm")
+        assert backend.depth() == 1
+        await running._run(await backend.pop())
+        # The key is free again: the next enqueue is new work, from either worker
+        assert await enqueuing.enqueue("warm", {}, key="warm")
+        assert backend.depth() == 1
+        await running._run(await backend.pop())
+
+    asyncio.run(run())
+    assert ran == [1, 1]
+
+
+def test_rejected_job_frees_its_key():
+    backend = main.LocalJobBackend(1)
+    queue = main.JobQueue(backend, workers=0, max_attempts=1, retry_seconds=0)
+
+    async def run():
+        await queue.enqueue("noop", {})
+        assert not await queue.enqueue("warm", {}, key="warm")
+        await backend.pop()
+        return await queue.enqueue("warm", {}, key="warm")
+
+    assert asyncio.run(run())
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(main.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def store(monkeypatch):
+    # A fresh store so other tests' logins don't count
+    store = main.LocalBucketStore(100)
+    monkeypatch.setattr(main, "rate_limit_store", store)
+    return store
+
+
+def take(store, key="k", attempts=3, seconds=30):
+    return asyncio.run(store.take(key, attempts, seconds))
+
+
+def test_bucket_empties_then_refills(clock):
+    store = main.LocalBucketStore(100)
+    assert [take(store) for _ in range(3)] == [0, 0, 0]
+    # One token comes back every 10 s
+    assert take(store) == pytest.approx(10)
+    clock[0] += 4
+    assert take(store) == pytest.approx(6)
+    clock[0] += 6
+    assert take(store) == 0
+    assert take(store) > 0
+
+
+def test_bucket_refill_is_capped(clock):
+    store = main.LocalBucketStore(100)
+    take(store)
+    clock[0] += 3600
+    assert [take(store) for _ in range(4)][-1] > 0
+
+
+def test_buckets_are_per_key(clock):
+    store = main.LocalBucketStore(100)
+    assert take(store, "a", attempts=1) == 0
+    assert take(store, "a", attempts=1) > 0
+    assert take(store, "b", attempts=1) == 0
+
+
+def test_least_recent_key_is_evicted(clock):
+    store = main.LocalBucketStore(2)
+    for key in ("a", "b", "c"):
+        take(store, key, attempts=1)
+    # "a" was dropped and starts over with a full bucket
+    assert take(store, "a", attempts=1) == 0
+    assert take(store, "c", attempts=1) > 0
+
+
+def test_ip_limit_answers_429_with_retry_after(client, store, monkeypatch):
+    monkeypatch.setitem(main.RATE_LIMITS_PER_IP, "/api/login", (2, 60))
+    credentials = {"username": "nobody@example.com", "password": "wrong"}
+    statuses = [client.post("/api/login", data=credentials).status_code for _ in range(3)]
+    assert statuses == [401, 401, 429]
+    response = client.post("/api/login", data=credentials)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "30"
+
+
+def test_ip_limit_is_post_only(client, store, monkeypatch):
+    monkeypatch.setitem(main.RATE_LIMITS_PER_IP, "/api/register", (1, 60))
+    for _ in range(3):
+        assert client.get("/api/register").status_code == 405
+
+
+def test_account_limit_answers_429_with_retry_after(client, store, monkeypatch):
+    monkeypatch.setitem(main.RATE_LIMITS_PER_ACCOUNT, "/api/login", (1, 300))
+    first = client.post("/api/login", data={"username": "Victim@example.com", "password": "a"})
+    # Same account, different spelling of the address
+    second = client.post("/api/login", data={"username": "victim@example.com", "password": "b"})
+    assert first.status_code == 401
+    assert second.status_code == 429
+    assert second.headers["Retry-After"] == "300"
@@ -0,0 +1,58 @@
+import json
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
+
+from jose import jwt
+
+import main
+from conftest import DB_PATH, login
+
+
+def levels(value):
+    return {comp: value for comp in main.scoring_engine.competences}
+
+
+def test_archived_history_keeps_deltas_and_exports(client, admin_headers):
+    headers = login(client)
+    email = client.get("/api/me", headers=headers).json()["email"]
+    user_id = jwt.get_unverified_claims(headers["Authorization"].removeprefix("Bearer "))["uid"]
+    old = datetime.now(timezone.utc) - timedelta(days=400)
+    records = [
+        {"email": email, "created_at": (old + timedelta(days=n)).isoformat(), **levels(value)}
+        for n, value in enumerate((2, 3, 6))
+    ]
+    response = client.post("/api/assessments/detailed/bulk", json=records, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    response = client.post("/api/assessments/detailed", json=levels(4), headers=headers)
+    assert response.status_code == 200, response.text
+
+    response = client.post("/api/admin/retention", params={"days": 30, "dry_run": "false"}, headers=admin_headers)
+    assert response.status_code == 202
+    for _ in range(100):
+        dry = client.post("/api/admin/retention", params={"days": 30}, headers=admin_headers).json()
+        if dry["rows"] == 0:
+            break
+        time.sleep(0.05)
+    assert dry["rows"] == 0
+
+    # Only the latest row is left: make the next read rebuild progress from scratch
+    with sqlite3.connect(DB_PATH) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM detailed_assessments WHERE user_id = ?", (user_id,)).fetchone() == (1,)
+        conn.execute("DELETE FROM user_progress WHERE user_id = ?", (user_id,))
+    progress = client.get(f"/api/admin/users/{user_id}/progress", headers=admin_headers).json()["detailed"]
+    assert progress["assessment_count"] == 4
+    assert progress["deltas"] == levels(-2.0)
+
+    def export(**params):
+        response = client.get(
+            "/api/admin/exports/assessments",
+            params={"kind": "detailed", "format": "ndjson", "user_id": user_id, **params}, headers=admin_headers,
+        )
+        assert response.status_code == 200, response.text
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    assert [row["creativity"] for row in export()] == [4]
+    rows = export(include_archived="true")
+    assert [row["creativity"] for row in rows] == [2, 3, 6, 4]
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
@@ -0,0 +1,86 @@
+import re
+from pathlib import Path
+
+import pytest
+
+from main import pack_thread_scores, scoring_engine, unpack_thread_scores
+
+FRONTEND_FRAMEWORK = Path(__file__).resolve().parents[2] / "frontend" / "app" / "lib" / "expert-framework.ts"
+
+
+def frontend_payload():
+    # What the expert form posts: every thread id from the TS framework (the
+    # threads sit one level deeper than the competences) with a level 1-8
+    thread_ids = re.findall(r'^        id: "([^"]+)"', FRONTEND_FRAMEWORK.read_text(encoding="utf-8"), re.M)
+    return {tid: 1 + i % 8 for i, tid in enumerate(thread_ids)}
+
+
+def legacy_payload():
+    # Builds from before the thread id fix sent "pm_ priorities"
+    payload = {tid: 1 + i % 8 for i, tid in enumerate(scoring_engine.thread_ids)}
+    payload["pm_ priorities"] = payload.pop("pm_priorities")
+    return payload
+
+
+def test_frontend_threads_match_framework():
+    assert sorted(frontend_payload()) == sorted(scoring_engine.thread_ids)
+
+
+@pytest.mark.parametrize("payload", [frontend_payload(), legacy_payload()], ids=["current", "legacy"])
+def test_payload_scores_every_competence(payload):
+    scores = scoring_engine.canonical(payload)
+    results = scoring_engine.score(scores)
+    assert set(results) == set(scoring_engine.competences)
+    assert all(value > 0 for value in results.values())
+    assert unpack_thread_scores(pack_thread_scores(scores)) == scoring_engine.canonical(frontend_payload())
+
+
+def test_legacy_and_current_id_together_is_rejected():
+    payload = legacy_payload()
+    payload["pm_priorities"] = 3
+    with pytest.raises(ValueError):
+        scoring_engine.canonical(payload)
+
+
+def test_unknown_thread_is_rejected():
+    with pytest.raises(ValueError):
+        scoring_engine.validate({"no_such_thread": 3})
+
+
+@pytest.mark.parametrize("payload", [frontend_payload(), legacy_payload()], ids=["current", "legacy"])
+def test_expert_submit(client, user_headers, payload):
+    response = client.post("/api/assessments/expert", json=payload, headers=user_headers)
+    assert response.status_code == 200, response.text
+    latest = client.get("/api/assessments/expert/latest", headers=user_headers).json()
+    assert latest["thread_scores"] == scoring_engine.canonical(frontend_payload())
+
+
+@pytest.mark.parametrize("value", [float("inf"), float("-inf"), float("nan"), 2.5, 0, 256, "3", True])
+def test_invalid_score_is_rejected(value):
+    with pytest.raises(ValueError):
+        scoring_engine.validate({"so_seize": value})
+
+
+def test_non_finite_score_is_a_422(client, user_headers):
+    # Python's JSON parser accepts Infinity and NaN
+    for literal in ("Infinity", "NaN", "1e999"):
+        response = client.post(
+            "/api/assessments/expert", content=f'{{"so_seize": {literal}}}',
+            headers={**user_headers, "Content-Type": "application/json"},
+        )
+        assert response.status_code == 422, (literal, response.text)
+
+
+def test_non_finite_score_fails_only_its_bulk_row(client, admin_headers):
+    email = client.get("/api/me", headers=admin_headers).json()["email"]
+    body = (
+        f'[{{"email": "{email}", "thread_scores": {{"so_seize": Infinity}}}},'
+        f' {{"email": "{email}", "thread_scores": {{"so_seize": 4}}}}]'
+    )
+    response = client.post(
+        "/api/assessments/expert/bulk", content=body,
+        headers={**admin_headers, "Content-Type": "application/json"},
+    )
+    assert response.status_code == 200, response.text
+    statuses = [row["status"] for row in response.json()["results"]]
+    assert statuses == ["error", "created"]
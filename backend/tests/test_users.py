@@ -0,0 +1,51 @@
+import sqlite3
+import uuid
+from types import SimpleNamespace
+
+from sqlalchemy import select
+from sqlalchemy.dialects import sqlite
+
+import main
+from conftest import DB_PATH
+
+
+def register(client, first_name, last_name, email):
+    response = client.post(
+        "/api/register", json={"email": email, "first_name": first_name, "last_name": last_name, "password": "pw"},
+    )
+    assert response.status_code == 200, response.text
+
+
+def listed_emails(client, admin_headers, **filters):
+    response = client.get("/api/admin/users", headers=admin_headers, params=filters)
+    assert response.status_code == 200, response.text
+    return {item["email"] for item in response.json()["items"]}
+
+
+def test_name_filter_matches_either_name_case_insensitively(client, admin_headers):
+    tag = uuid.uuid4().hex[:8]
+    register(client, f"Q{tag}ander", "Smith", f"first-{tag}@example.com")
+    register(client, "Jo", f"q{tag.upper()}son", f"last-{tag}@example.com")
+    register(client, "Jo", f"Smith-q{tag}", f"middle-{tag}@example.com")
+
+    assert listed_emails(client, admin_headers, name=f"q{tag}".upper()) == {
+        f"first-{tag}@example.com", f"last-{tag}@example.com",
+    }
+
+
+def test_prefix_filters_match_wildcards_literally(client, admin_headers):
+    tag = uuid.uuid4().hex[:8]
+    register(client, f"P{tag}%a", "Smith", f"{tag}_a@example.com")
+    register(client, f"P{tag}xa", "Smith", f"{tag}xa@example.com")
+
+    assert listed_emails(client, admin_headers, email=f"{tag.upper()}_") == {f"{tag}_a@example.com"}
+    assert listed_emails(client, admin_headers, name=f"p{tag}%") == {f"{tag}_a@example.com"}
+
+
+def test_prefix_filter_is_an_index_search_on_sqlite():
+    db = SimpleNamespace(bind=SimpleNamespace(dialect=sqlite.dialect()))
+    query = select(main.DBUser.id).where(main.istartswith_indexed(db, main.DBUser.email, "ab"))
+    sql = str(query.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+    with sqlite3.connect(DB_PATH) as conn:
+        plan = " ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}"))
+    assert "SEARCH users USING INDEX ix_users_email_lower" in plan
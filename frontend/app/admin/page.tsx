@@ -11,6 +11,13 @@ interface ManagedUser {
   role: string;
   is_active: boolean;
   assessment_count: number; // New field
+  detailed_count: number;
+  expert_count: number;
+}
+
+interface UserPage {
+  items: ManagedUser[];
+  next_cursor: string | null;
 }
 
 export default function AdminDashboard() {
@@ -18,6 +25,7 @@ export default function AdminDashboard() {
   const [isAdmin, setIsAdmin] = useState(false);
   const [users, setUsers] = useState<ManagedUser[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
 
   const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
@@ -33,14 +41,17 @@ export default function AdminDashboard() {
     }
   }, [router]);
 
-  const fetchUsers = async (token: string) => {
+  // The list is paginated: each page returns a cursor for the next one
+  const fetchUsers = async (token: string, cursor: string | null = null) => {
     try {
-      const response = await fetch(`${API_URL}/api/admin/users`, {
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+      const response = await fetch(`${API_URL}/api/admin/users${query}`, {
         headers: { Authorization: `Bearer ${token}` },
       });
       if (response.ok) {
-        const data = await response.json();
-        setUsers(data);
+        const data: UserPage = await response.json();
+        setUsers(prev => (cursor ? [...prev, ...data.items] : data.items));
+        setNextCursor(data.next_cursor);
       }
     } catch (err) {
       console.error("Failed to load users", err);
@@ -125,7 +136,7 @@ export default function AdminDashboard() {
         <td className="px-6 py-4 text-center">
           <div className="flex flex-col items-center">
             <span className="font-bold text-gray-700">{u.assessment_count}</span>
-            {u.assessment_count > 0 && (
+            {u.detailed_count > 0 && (
               <button 
                 onClick={() => router.push(`/admin/assessments/${u.id}`)}
                 className="text-[10px] text-blue-600 font-bold uppercase hover:underline mt-1"
@@ -178,6 +189,16 @@ export default function AdminDashboard() {
   </tbody>
 </table>
           )}
+          {nextCursor && (
+            <div className="p-4 text-center border-t border-gray-100">
+              <button
+                onClick={() => fetchUsers(localStorage.getItem("token") || "", nextCursor)}
+                className="text-xs font-bold py-2 px-4 rounded-xl text-blue-600 bg-blue-50 hover:bg-blue-100 transition-all"
+              >
+                Load more
+              </button>
+            </div>
+          )}
         </div>
       </main>
     </div>
@@ -24,6 +24,8 @@ export default function ExpertAssessmentPage() {
   
   const scrollRef = useRef<HTMLDivElement>(null);
   const [scores, setScores] = useState<Record<string, number>>({});
+  // Same key for retries and double-clicks of the same answers, so the server saves them once
+  const idempotencyKey = useMemo(() => crypto.randomUUID(), [scores]);
 
   useEffect(() => {
     const fetchExistingExpertData = async () => {
@@ -120,7 +122,11 @@ export default function ExpertAssessmentPage() {
       const token = localStorage.getItem("token");
       const response = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/api/assessments/expert`, {
         method: "POST",
-        headers: { "Content-Type": "application/json", "Authorization": `Bearer ${token}` },
+        headers: {
+          "Content-Type": "application/json",
+          "Authorization": `Bearer ${token}`,
+          "Idempotency-Key": idempotencyKey,
+        },
         body: JSON.stringify(scores),
       });
       if (!response.ok) throw new Error("Failed to save");
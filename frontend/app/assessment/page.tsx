@@ -1,6 +1,6 @@
 "use client";
 
-import { useState, useEffect } from "react";
+import { useState, useEffect, useMemo } from "react";
 import { useRouter } from "next/navigation";
 import { ENTRECOMP_STEPS } from "@/app/lib/constants";
 
@@ -20,6 +20,8 @@ export default function AssessmentWizard() {
   const [scores, setScores] = useState<Record<string, number>>(
     Object.fromEntries(ENTRECOMP_STEPS.flatMap(s => s.fields.map(f => [f.key, 1])))
   );
+  // Same key for retries and double-clicks of the same answers, so the server saves them once
+  const idempotencyKey = useMemo(() => crypto.randomUUID(), [scores]);
 
   // 1. Fetch existing assessment data on mount to pre-load the sliders
   useEffect(() => {
@@ -74,7 +76,8 @@ export default function AssessmentWizard() {
         method: "POST",
         headers: { 
           "Content-Type": "application/json",
-          "Authorization": `Bearer ${token}`
+          "Authorization": `Bearer ${token}`,
+          "Idempotency-Key": idempotencyKey
         },
         body: JSON.stringify(scores),
       });
@@ -40,6 +40,9 @@ export default function SettingsPage() {
       });
 
       if (response.ok) {
+        // Changing the password revokes older tokens, keep the one issued for this session
+        const data = await response.json();
+        localStorage.setItem("token", data.access_token);
         setStatus({ type: "success", message: "Success! Redirecting..." });
         setTimeout(() => router.push("/dashboard"), 1500);
       } else {
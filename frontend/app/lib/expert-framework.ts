@@ -728,7 +728,7 @@ export const EXPERT_ASSESSMENT_FRAMEWORK: ExpertCompetence[] = [
         }
       },
       {
-        id: "pm_ priorities",
+        id: "pm_priorities",
         title: "Define priorities",
         levels: {
           1: "I can recall the order of steps that was needed in a simple value creating activity I took part in.",